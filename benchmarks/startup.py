@@ -0,0 +1,113 @@
+"""Startup time benchmark for the repodoc CLI.
+
+Runs each scenario in a fresh interpreter several times and reports the
+mean and best wall clock time. Best times can be saved and compared with
+the ``startup/*`` entries of a suite baseline, see suite.py::
+
+    python benchmarks/startup.py -n 20
+    python benchmarks/startup.py --compare benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(ROOT, "repodoc_config.yml")
+
+# Same as the ``repodoc`` console script, without the entry point shim.
+CLI = ["-c", "import sys; from repodoc.commands import main; main()"]
+SCENARIOS = {
+    "import repodoc": ["-c", "import repodoc"],
+    "import repodoc.commands": ["-c", "import repodoc.commands"],
+    "repodoc -v": CLI + ["-v"],
+    "repodoc get_vars -l": CLI + ["get_vars", "-l"],
+    "repodoc dots": CLI + ["dots"],
+}
+
+
+def time_scenario(argv, runs, cwd):
+    """Return list of wall clock seconds for running argv runs times."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + argv,
+            cwd=cwd,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+@contextlib.contextmanager
+def scenario_dir():
+    """Yield a temporary directory holding a copy of the repodoc config."""
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(CONFIG) as src, open(
+            os.path.join(workdir, "repodoc_config.yml"), "w"
+        ) as dst:
+            dst.write(src.read())
+        yield workdir
+
+
+def run_scenarios(runs, verbose=False):
+    """Return {"startup/<scenario>": best seconds} over SCENARIOS."""
+    results = {}
+    with scenario_dir() as workdir:
+        if verbose:
+            print(f"{'scenario':<28}{'mean ms':>10}{'best ms':>10}")
+        for name, argv in SCENARIOS.items():
+            timings = time_scenario(argv, runs, workdir)
+            results[f"startup/{name}"] = min(timings)
+            if verbose:
+                print(
+                    f"{name:<28}"
+                    f"{statistics.mean(timings) * 1000:>10.1f}"
+                    f"{min(timings) * 1000:>10.1f}"
+                )
+    return results
+
+
+def main():
+    """Run Startup Benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--save", metavar="FILE",
+                        help="write best times json to FILE")
+    parser.add_argument("--compare", metavar="BASELINE", nargs="?",
+                        const=os.path.join(os.path.dirname(
+                            os.path.abspath(__file__)), "baseline.json"),
+                        help="compare best times against the startup"
+                        " entries of BASELINE (default baseline.json)")
+    parser.add_argument("-t", "--threshold", type=float, default=0.25,
+                        help="relative slowdown flagged as a regression")
+    args = parser.parse_args()
+    current = {"results": run_scenarios(args.runs, verbose=True)}
+    if args.save:
+        with open(args.save, "w") as wf:
+            json.dump(current, wf, indent=1, sort_keys=True)
+            wf.write("\n")
+    if args.compare:
+        import suite
+
+        baseline = suite.load(args.compare)
+        baseline["results"] = {
+            k: v for k, v in baseline["results"].items()
+            if k.startswith("startup/")
+        }
+        print()
+        if suite.compare(baseline, current, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Benchmark suite for the repodoc hot paths.
+
+Measures import time, variable lookup and parsing, rendering of every
+template group and licence, writes on tmpfs and on a regular disk and an
+end-to-end generation of N synthetic repos. Results are stored as json and
+can be compared against a baseline::
+
+    python benchmarks/suite.py run --save current.json
+    python benchmarks/suite.py compare benchmarks/baseline.json current.json
+    python benchmarks/suite.py run --compare benchmarks/baseline.json
+
+Each benchmark reports the best time per call in seconds over several
+repeats, which is the most stable figure on a busy machine.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import platform
+import timeit
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import startup  # noqa: E402
+from repodoc import render, writer, commands, settings  # noqa: E402
+from repodoc.session import RepoDocSession, Engines  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+CONTEXT = settings.load(os.path.join(ROOT, "repodoc_config.yml"))
+
+
+def best_of(func, repeat=5, number=None, budget=0.02):
+    """Return best seconds per call of func.
+
+    Without number, loops are sized so one repeat takes about budget seconds.
+    """
+    timer = timeit.Timer(func)
+    if number is None:
+        number = max(1, int(budget / max(timer.timeit(1), 1e-7)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def bench_import(results, runs):
+    results.update(startup.run_scenarios(runs))
+
+
+def bench_variables(results):
+    for t_name in render.Templates:
+        results[f"get_variables/{t_name}"] = best_of(
+            lambda: render.get_variables(t_name))
+        results[f"parse_variables/{t_name}"] = best_of(
+            lambda: render.parse_variables(t_name))
+    results["get_all_template_variables"] = best_of(
+        commands.get_all_template_variables)
+
+
+@contextlib.contextmanager
+def environ(**values):
+    """Set environment variables for the duration of the block."""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+def render_cache_disabled():
+    """Disable the render cache so renders are measured, not cache hits."""
+    return environ(REPODOC_RENDER_CACHE="0")
+
+
+def bench_render(results):
+    with render_cache_disabled():
+        for group in render.GroupNames:
+            if group == "licence":
+                continue
+            results[f"render_group/{group}"] = best_of(
+                lambda: render.render_group(group, **CONTEXT))
+        context = {k: v for k, v in CONTEXT.items() if k != "licence"}
+        for licence in render.LicenceMap:
+            results[f"render_licence/{licence}"] = best_of(
+                lambda: render.render_licence(licence, **context))
+
+
+def bench_write(results):
+    files = RepoDocSession(context=CONTEXT).render_groups(
+        ["community_health", "sphinx_docs", "pypi_project", "dot_files"])
+    targets = {"disk": os.path.dirname(os.path.abspath(__file__))}
+    if os.path.isdir("/dev/shm"):
+        targets["tmpfs"] = "/dev/shm"
+    for name, parent in targets.items():
+        workdir = tempfile.mkdtemp(prefix="repodoc-bench-", dir=parent)
+        try:
+            def write_all():
+                for out_path, content in files.items():
+                    writer.write_rendered_template(
+                        out_path, content, base_path=workdir)
+
+            results[f"write_rendered_template/{name}"] = best_of(
+                write_all, number=20) / len(files)
+        finally:
+            shutil.rmtree(workdir)
+
+
+def bench_end_to_end(results, repos):
+    for engine in Engines:
+        session = RepoDocSession(context=CONTEXT, engine=engine)
+        workdir = tempfile.mkdtemp(prefix="repodoc-bench-")
+        try:
+            def generate():
+                for n in range(repos):
+                    session.generate_plan(
+                        context={"program_name": f"repo{n}"},
+                        base_path=os.path.join(workdir, f"repo{n}"),
+                    )
+
+            name = "end_to_end"
+            if engine != "threads":
+                name += f"_{engine}"
+            with render_cache_disabled():
+                results[f"{name}/{repos}_repos"] = best_of(
+                    generate, repeat=3, number=1)
+        finally:
+            shutil.rmtree(workdir)
+
+
+def run(args):
+    """Run the suite, return results dict.
+
+    Every cache lives in a temporary ``REPODOC_CACHE_DIR`` so the user's own
+    cache is neither used nor filled.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir, environ(
+            REPODOC_CACHE_DIR=cache_dir):
+        bench_import(results, args.runs)
+        bench_variables(results)
+        bench_render(results)
+        bench_write(results)
+        bench_end_to_end(results, args.repos)
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Print comparison table, return list of regressed benchmark names.
+
+    Benchmarks present in only one of the files are listed as missing.
+    """
+    regressions = []
+    missing = 0
+    print(f"{'benchmark':<56}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        base = baseline["results"].get(name)
+        now = current["results"].get(name)
+        if base is None or now is None:
+            missing += 1
+            base = "missing" if base is None else f"{base * 1e3:.3f}ms"
+            now = "missing" if now is None else f"{now * 1e3:.3f}ms"
+            print(f"{name:<56}{base:>12}{now:>12}")
+            continue
+        if not base:
+            continue
+        change = (now - base) / base
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<56}{base * 1e3:>10.3f}ms{now * 1e3:>10.3f}ms"
+              f"{change:>+9.1%}{flag}")
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%},"
+          f" {missing} benchmark(s) missing from one side.")
+    return regressions
+
+
+def load(filename):
+    with open(filename) as rf:
+        return json.load(rf)
+
+
+def main():
+    """Run Benchmark Suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the suite")
+    run_parser.add_argument("-n", "--runs", type=int, default=5,
+                            help="fresh interpreters per startup benchmark")
+    run_parser.add_argument("-r", "--repos", type=int, default=20,
+                            help="synthetic repos for the end to end run")
+    run_parser.add_argument("--save", metavar="FILE",
+                            help="write results json to FILE")
+    run_parser.add_argument("--compare", metavar="BASELINE",
+                            help="compare results against BASELINE json")
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare two result files")
+    compare_parser.add_argument("baseline", nargs="?", default=BASELINE)
+    compare_parser.add_argument("current")
+    for p in (run_parser, compare_parser):
+        p.add_argument("-t", "--threshold", type=float, default=0.25,
+                       help="relative slowdown flagged as a regression")
+    args = parser.parse_args()
+    if args.command == "run":
+        current = run(args)
+        if args.save:
+            with open(args.save, "w") as wf:
+                json.dump(current, wf, indent=1, sort_keys=True)
+                wf.write("\n")
+        if not args.compare:
+            for name, seconds in sorted(current["results"].items()):
+                print(f"{name:<56}{seconds * 1e3:>10.3f}ms")
+            return
+        baseline = load(args.compare)
+    else:
+        baseline, current = load(args.baseline), load(args.current)
+    if compare(baseline, current, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
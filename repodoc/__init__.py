@@ -1,12 +1,36 @@
 """tekrepodoc package."""
-from . import render
-from . import writer
-from . import commands
+import importlib
+import time
+
+# Read by ``repodoc --profile`` to report the import phase.
+_import_started = time.perf_counter()
 
 __all__ = [
     "render",
     "writer",
     "commands",
+    "cache",
+    "index",
+    "batch",
+    "lock",
+    "server",
+    "session",
+    "compiled",
+    "settings",
+    "profiling",
+    "aio",
+    "sinks",
+    "memo",
+    "RepoDocSession",
 ]
 
 __version__ = "0.0.9"
+
+
+def __getattr__(name):
+    """Import submodules on first access to keep ``import repodoc`` cheap."""
+    if name == "RepoDocSession":
+        return importlib.import_module(f"{__name__}.session").RepoDocSession
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
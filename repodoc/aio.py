@@ -0,0 +1,125 @@
+"""asyncio render and write pipeline for high latency filesystems.
+
+On network filesystems every ``makedirs``, ``open``, ``write`` and
+``close`` is a round trip to the server. This engine loads templates and
+looks up the render cache on a small executor (that work is CPU bound and
+holds the GIL) while up to ``limit`` filesystem operations are in flight on
+an io executor. Outputs are streamed, as with the threads engine: their
+chunks are rendered as the io executor writes them, and the transaction
+commit creates directories and moves files into place on that same
+executor. Total time is then bound by bandwidth rather than by per file
+latency.
+
+Select it with ``repodoc --engine async`` or ``RepoDocSession(engine=
+"async")``; ``--jobs`` sets the number of concurrent filesystem operations.
+"""
+import os
+import asyncio
+import logging
+import functools
+import concurrent.futures
+from repodoc import lock
+from repodoc import render
+from repodoc.log import buffered_logger, replay_records
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "DefaultLimit",
+    "RenderWorkers",
+    "agenerate_outputs",
+    "generate_outputs",
+]
+
+DefaultLimit = 32
+RenderWorkers = 2
+
+
+async def _generate_one(t_name, out_path, kwargs, txn, entry, incremental,
+                        record, pools, limit, logger=logger):
+    """Generate out_path from t_name into txn, return (status, lock entry).
+
+    The lock entry is None unless incremental or record.
+    """
+    loop = asyncio.get_running_loop()
+    render_pool, io_pool = pools
+
+    async def io(func, *args, **kw):
+        async with limit:
+            return await loop.run_in_executor(
+                io_pool, functools.partial(func, *args, **kw))
+
+    disk = t_hash = ctx_hash = None
+    if incremental:
+        status, t_hash, ctx_hash, disk = await io(
+            lock.plan_output, t_name, kwargs, entry,
+            os.path.join(txn.base_path, out_path), logger=logger,
+        )
+        if status == lock.SKIPPED:
+            logger.debug(f"Skipped {out_path}, inputs unchanged.")
+            return (status, entry)
+        if status == lock.CONFLICT:
+            logger.warning(
+                f"Conflict {out_path} was modified, not overwritten.")
+            return (status, entry)
+    _, chunks = await loop.run_in_executor(
+        render_pool,
+        functools.partial(
+            render.stream_template, t_name, logger=logger, **kwargs),
+    )
+    out_hash = await io(txn.write, out_path, chunks, logger=logger)
+    if not incremental:
+        if not record:
+            return (lock.WRITTEN, None)
+        t_hash, ctx_hash = await io(
+            lock.input_hashes, t_name, kwargs, logger=logger)
+        return (lock.WRITTEN,
+                lock.make_entry(t_name, t_hash, ctx_hash, out_hash))
+    status = lock.WRITTEN
+    if disk is not None and disk[0] == out_hash:
+        await io(txn.discard, out_path, logger=logger)
+        logger.debug(f"Skipped {out_path}, output unchanged.")
+        status = lock.SKIPPED
+    return (status, lock.make_entry(t_name, t_hash, ctx_hash, out_hash))
+
+
+async def agenerate_outputs(outputs, kwargs, txn, entries=None,
+                            incremental=False, record=False,
+                            limit=DefaultLimit, logger=logger):
+    """Generate outputs, a list of (template, output path), and commit txn.
+
+    With record lock entries are returned for outputs written outside
+    incremental mode too. Log records of each output are replayed in
+    outputs order. Return list of (status, lock entry) in outputs order.
+    """
+    entries = entries or {}
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(limit)
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=RenderWorkers
+    ) as render_pool, concurrent.futures.ThreadPoolExecutor(
+        max_workers=limit
+    ) as io_pool:
+        loggers = [buffered_logger() for _ in outputs]
+        results = await asyncio.gather(*(
+            _generate_one(
+                t_name, out_path, kwargs, txn, entries.get(out_path),
+                incremental, record, (render_pool, io_pool), semaphore,
+                logger=task_logger,
+            )
+            for (t_name, out_path), (task_logger, _) in zip(outputs, loggers)
+        ))
+        for _, records in loggers:
+            replay_records(records, logger)
+        await loop.run_in_executor(
+            None, functools.partial(txn.commit, logger=logger, pool=io_pool))
+    return results
+
+
+def generate_outputs(outputs, kwargs, txn, entries=None, incremental=False,
+                     record=False, limit=DefaultLimit, logger=logger):
+    """Run agenerate_outputs on a new event loop, return its results."""
+    return asyncio.run(agenerate_outputs(
+        outputs, kwargs, txn, entries=entries, incremental=incremental,
+        record=record, limit=limit, logger=logger,
+    ))
@@ -0,0 +1,182 @@
+"""Render many repositories from one manifest across a process pool.
+
+A manifest is a YAML or JSON file of the form::
+
+    workers: 8                      # optional
+    groups: [licence, readme]       # optional, default render.plan_groups
+    context: {author_name: Me}      # optional, shared by every repo
+    engine: async                   # optional, see repodoc.aio
+    fsync: end                      # optional, see writer.FsyncModes
+    repos:
+      - output: build/repo1
+        config: repo1/repodoc_config.yml
+      - output: build/repo2
+        context: {program_name: repo2}
+        groups: [dot_files]
+
+``config`` paths are relative to the manifest. A plain list is accepted as
+``repos``. A directory is also a valid manifest: every ``*.yml``,
+``*.yaml`` or ``*.json`` config in it becomes one repo rendered into
+``<directory>/<config stem>`` unless the config sets ``output``.
+
+Every repo is generated like ``repodoc all``: the groups enabled by its
+config flags, deduplicated by output path.
+"""
+import os
+import time
+import logging
+import concurrent.futures
+from repodoc import lock
+from repodoc import render
+from repodoc import settings
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "load_manifest",
+    "job_groups",
+    "job_outputs",
+    "run_job",
+    "run_batch",
+]
+
+_CONFIG_EXTENSIONS = (".yml", ".yaml", ".json")
+
+
+def _job(repo, base_dir, defaults):
+    """Resolve a manifest repo entry into a picklable job dict."""
+    context = dict(defaults.get("context") or {})
+    if repo.get("config"):
+        context.update(settings.load(os.path.join(base_dir, repo["config"])))
+    context.update(repo.get("context") or {})
+    output = repo.get("output") or context.pop("output", None)
+    if not output:
+        raise ValueError(f"Manifest entry {repo!r} has no output directory.")
+    return {
+        "output": os.path.abspath(os.path.join(base_dir, output)),
+        "context": context,
+        "groups": repo.get("groups") or defaults.get("groups"),
+        "engine": repo.get("engine") or defaults.get("engine", "threads"),
+        "fsync": repo.get("fsync") or defaults.get("fsync", "none"),
+    }
+
+
+def load_manifest(path):
+    """Return (jobs, settings) read from manifest file or config directory."""
+    if os.path.isdir(path):
+        repos = [
+            {
+                "config": name,
+                "output": os.path.splitext(name)[0],
+            }
+            for name in sorted(os.listdir(path))
+            if name.endswith(_CONFIG_EXTENSIONS)
+        ]
+        jobs = []
+        for repo in repos:
+            job = _job(repo, path, {})
+            if "output" in job["context"]:
+                job["output"] = os.path.abspath(
+                    os.path.join(path, job["context"].pop("output"))
+                )
+            jobs.append(job)
+        return jobs, {}
+    manifest = settings.load(path)
+    if isinstance(manifest, list):
+        manifest = {"repos": manifest}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = [_job(repo, base_dir, manifest) for repo in manifest["repos"]]
+    return jobs, manifest
+
+
+def job_groups(job):
+    """Return template groups to render for job.
+
+    Default to render.plan_groups for the config flags of the job.
+    """
+    groups = job.get("groups") or render.plan_groups(job["context"])
+    if not job["context"].get("licence"):
+        groups = [g for g in groups if g != "licence"]
+    return groups
+
+
+def job_outputs(job):
+    """Return deduplicated (template_name, output_filename) list of job."""
+    return render.plan_outputs(job_groups(job), job["context"])
+
+
+def _quiet_logger():
+    quiet = logging.getLogger("repodoc.batch.worker")
+    quiet.propagate = False
+    if not quiet.handlers:
+        quiet.addHandler(logging.NullHandler())
+    return quiet
+
+
+def run_job(job):
+    """Generate job, return (output paths, {output path: diff}).
+
+    The paths are those written or, with ``dry_run`` or ``diff`` set, those
+    that would change, in which case nothing is written and the diffs are
+    filled with ``diff``.
+    """
+    try:
+        return _run_job(job)
+    finally:
+        from repodoc import memo
+
+        memo.flush_stats()
+
+
+def _run_job(job):
+    from repodoc.session import RepoDocSession
+
+    session = RepoDocSession(
+        base_path=job["output"],
+        fsync=job.get("fsync", "none"),
+        engine=job.get("engine") or "threads",
+        logger=_quiet_logger(),
+    )
+    outputs = job_outputs(job)
+    if job.get("dry_run") or job.get("diff"):
+        report, diffs = session.check_outputs(
+            outputs, context=job["context"], diff=job.get("diff", False))
+        return report[lock.WRITTEN], diffs
+    report = session.generate_outputs(outputs, context=job["context"])
+    return report[lock.WRITTEN], {}
+
+
+def run_batch(jobs, workers=None, logger=logger):
+    """Run jobs on a process pool and return a summary dict.
+
+    Its ``changes`` map the output directory of dry run jobs to the
+    (paths, diffs) returned by run_job.
+    """
+    started = time.perf_counter()
+    files = 0
+    failures = []
+    changes = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            job = futures[future]
+            try:
+                paths, diffs = future.result()
+            except Exception as e:
+                failures.append((job["output"], repr(e)))
+                logger.error(f"Failed {job['output']}: {e!r}.")
+                continue
+            files += len(paths)
+            if job.get("dry_run") or job.get("diff"):
+                changes[job["output"]] = (paths, diffs)
+            logger.debug(f"Rendered {len(paths)} files into {job['output']}.")
+    elapsed = time.perf_counter() - started
+    return {
+        "repos": len(jobs),
+        "files": files,
+        "failures": failures,
+        "changes": changes,
+        "seconds": elapsed,
+        "repos_per_second": len(jobs) / elapsed if elapsed else 0.0,
+        "files_per_second": files / elapsed if elapsed else 0.0,
+    }
@@ -0,0 +1,114 @@
+"""On-disk caches used to speed up short repodoc runs.
+
+The cache root is ``$REPODOC_CACHE_DIR`` if set, else
+``$XDG_CACHE_HOME/repodoc`` (``~/.cache/repodoc``). Every cache lives in a
+subfolder named after ``repodoc.__version__`` so upgrading repodoc never
+reuses data produced by another release. Set ``REPODOC_NO_CACHE=1`` to
+disable all on-disk caching.
+"""
+import os
+import re
+import shutil
+import logging
+import repodoc
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "cache_dir",
+    "version_dir",
+    "enabled",
+    "get_bytecode_cache",
+    "clear",
+    "stats",
+]
+
+
+def enabled():
+    """Return False when on-disk caching has been disabled."""
+    return os.environ.get("REPODOC_NO_CACHE", "") in ("", "0")
+
+
+def cache_dir():
+    """Return the repodoc cache root directory."""
+    if os.environ.get("REPODOC_CACHE_DIR"):
+        return os.environ["REPODOC_CACHE_DIR"]
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(xdg_cache, "repodoc")
+
+
+def version_dir(*parts):
+    """Return cache subdirectory for this repodoc version, creating it."""
+    path = os.path.join(cache_dir(), repodoc.__version__, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+_VERSION_DIR = re.compile(r"\d+(\.\d+)+")
+
+
+def _version_dirs(root):
+    """Return names of the per version directories under root."""
+    return [
+        name for name in sorted(os.listdir(root))
+        if _VERSION_DIR.match(name)
+        and os.path.isdir(os.path.join(root, name))
+    ]
+
+
+def get_bytecode_cache(logger=logger):
+    """Return a jinja2 bytecode cache or None if caching is unavailable.
+
+    Jinja2 keys each entry by template name and checks the sha1 of the
+    template source before reusing it, so edited templates are recompiled.
+    """
+    if not enabled():
+        return None
+    import jinja2
+
+    try:
+        directory = version_dir("bytecode")
+    except OSError as e:
+        logger.debug(f"{__name__}: bytecode cache disabled: {e}.")
+        return None
+    return jinja2.FileSystemBytecodeCache(directory=directory)
+
+
+def clear(logger=logger):
+    """Remove the cached data of every repodoc version.
+
+    Only the per version directories and the ``renders`` store under the
+    cache root are removed; the root may be shared with other files, such
+    as the daemon socket.
+    """
+    root = cache_dir()
+    if os.path.isdir(root):
+        for name in _version_dirs(root) + ["renders"]:
+            path = os.path.join(root, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+    logger.info(f"Cleared cache {root}.")
+
+
+def stats():
+    """Return dict of {cache_name: {"files": n, "bytes": size}} per version.
+
+    The render cache, see repodoc.memo, is not versioned and not included.
+    """
+    root = cache_dir()
+    result = {}
+    if not os.path.isdir(root):
+        return result
+    for version in _version_dirs(root):
+        version_path = os.path.join(root, version)
+        for name in sorted(os.listdir(version_path)):
+            files = size = 0
+            for dirpath, _, filenames in os.walk(
+                    os.path.join(version_path, name)):
+                for filename in filenames:
+                    files += 1
+                    size += os.path.getsize(os.path.join(dirpath, filename))
+            result[f"{version}/{name}"] = {"files": files, "bytes": size}
+    return result
@@ -2,17 +2,20 @@
 import argparse
 import yaml
 import os
+import sys
 import logging
 import repodoc
 from repodoc.log import configure_logger
+from repodoc.session import RepoDocSession, Engines
 from repodoc import writer
 from repodoc import render
-from repodoc import prompt
+from repodoc import cache
+from repodoc import index
+from repodoc import lock
+from repodoc import profiling
 
-try:
-    from yaml import CLoader as Loader, CDumper as Dumper
-except ImportError:
-    from yaml import Loader, Dumper
+from repodoc import settings
+from repodoc.settings import Dumper
 
 logger = logging.getLogger("repodoc")
 
@@ -41,11 +44,43 @@ __all__ = [
     "update_config_file",
     "resolve_template_name",
     "get_main_parser",
+    "cache_command",
+    "index_command",
+    "batch_command",
+    "generate_group",
+    "check_group",
+    "check_outputs",
+    "serve",
+    "get_session",
+    "RepoDocSession",
+    "compile_command",
+    "all_groups",
+    "run_profiled",
+    "get_sink",
+    "watch_command",
+    "regenerate_dependents",
+    "invalid_choice",
+    "load_answers",
+    "env_answers",
+    "validate_answers",
+    "ListVariables",
+    "BoolVariables",
 ]
 
 
-def get_all_template_variables(Templates=render.Templates, logger=logger):
+def __getattr__(name):
+    """Import the click based prompt module only when it is asked for."""
+    if name == "prompt":
+        from repodoc import prompt
+
+        return prompt
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_all_template_variables(Templates=None, logger=logger):
     """Return all template variables."""
+    if Templates is None:
+        Templates = render.Templates
     all_vars = []
     for t_name in Templates:
         t_vars = render.get_variables(t_name, logger=logger)
@@ -68,6 +103,18 @@ def resolve_template_name(tname):
         return
 
 
+def invalid_choice(args, argument, value, choices):
+    """Exit with an argparse style invalid choice error.
+
+    Template and licence names are checked after parsing, so that building
+    the parser does not discover the templates.
+    """
+    args.parser.error(
+        f"argument {argument}: invalid choice: {value!r}"
+        f" (choose from {', '.join(map(repr, choices))})"
+    )
+
+
 def get_template_variables(args):
     """Return all variables for the given template."""
     logger = configure_logger(
@@ -86,24 +133,29 @@ def get_template_variables(args):
             template_name if template_name.endswith(
                 ".j2") else template_name + ".j2"
         )
+        if resolve_template_name(t_name) is None:
+            invalid_choice(args, "-t/--template_name", template_name,
+                           render.TemplateNames)
         t_vars = render.get_variables(
             resolve_template_name(t_name), logger=logger)
         print(yaml.dump(t_vars))
         return t_vars
 
 
+ListVariables = ["install_requires", "console_scripts"]
+BoolVariables = ["readthedocs", "create_docs", "pypi"]
+
+
 def gen_default_context():
     """Generate Default Context Dict for Configuration."""
     variables = get_all_template_variables()
 
     def get_var_default(v):
-        list_vs = ["install_requires", "console_scripts"]
-        bool_vs = ["readthedocs", "pypi", "create_docs"]
-        if v in list_vs:
+        if v in ListVariables:
             return [
                 "",
             ]
-        elif v in bool_vs:
+        elif v in BoolVariables:
             return True
         else:
             return ""
@@ -111,42 +163,37 @@ def gen_default_context():
     return dict(zip(variables, list(map(get_var_default, variables))))
 
 
-def gen_config_file(
-    filename="repodoc_config.yml", context=gen_default_context(), **kwargs
-):
+def gen_config_file(filename="repodoc_config.yml", context=None, **kwargs):
     """Generate Sample Configuration File."""
-    data = context
-    with open(filename, "w") as wf:
-        yaml.dump(data, wf, Dumper=Dumper)
+    data = context if context is not None else gen_default_context()
+    settings.dump(filename, data)
     logger.info(f"Generated Configuration in {filename}")
     return data
 
 
 def update_config_file(file, config):
     """Update Config File with config data."""
-    with open(file, "w") as wf:
-        yaml.dump(config, wf, Dumper=Dumper)
+    settings.dump(file, config)
     logger.info(f"Updated Configuration in {file}")
     return
 
 
 def config_from_file(config_file):
     """Read and Return dict of configuration parameters from file."""
-    with open(config_file, "r") as cf:
-        config = yaml.load(cf, Loader=Loader)
-    return config
+    return settings.load(config_file)
 
 
 def config(args):
     """Configure Subcommand to init,set,get,list configs."""
-    configure_logger(
+    logger = configure_logger(
         stream_level="DEBUG" if args.verbose else "INFO",
         debug_file=None,
     )
-    to_append = ["install_requires", "console_scripts"]
-    bool_vals = ["readthedocs", "create_docs", "pypi"]
+    to_append = ListVariables
+    bool_vals = BoolVariables
     if not args.init:
         config = config_from_file(args.config_file)
+        previous = dict(config)
     if args.list:
         print(yaml.dump(config))
         return
@@ -155,7 +202,7 @@ def config(args):
         return
     if args.add:
         if args.add[0] in to_append:
-            config[args.add[0]] = config[args.add[0]].append(args.add[1])
+            config[args.add[0]] = config.get(args.add[0], []) + [args.add[1]]
         else:
             if args.add[0] in bool_vals:
                 if args.add[1].upper() == "True".upper():
@@ -165,9 +212,15 @@ def config(args):
             else:
                 config[args.add[0]] = args.add[1]
         update_config_file(args.config_file, config)
+        if args.regenerate:
+            regenerate_dependents(previous, config, args, logger=logger)
         return
     if args.init:
-        configure(args)
+        try:
+            configure(args)
+        except (OSError, ValueError) as e:
+            logger.error(str(e))
+            raise SystemExit(1)
         return
     if args.set:
         if args.set[0] in to_append:
@@ -181,10 +234,150 @@ def config(args):
             else:
                 config[args.set[0]] = args.set[1]
         update_config_file(args.config_file, config)
+        if args.regenerate:
+            regenerate_dependents(previous, config, args, logger=logger)
         return
     return
 
 
+def regenerate_dependents(old, new, args, logger=logger,
+                          base_path=os.path.abspath(os.path.curdir)):
+    """Regenerate only the outputs depending on config keys changed.
+
+    Outputs neither on disk nor in the lock file under base_path were never
+    generated and are left out, so a partial scaffold is not completed.
+    ``--dry-run`` and ``--diff`` hand over to check_outputs.
+
+    Return dict of {status: [output paths]}.
+    """
+    session = get_session(args, logger=logger)
+    keys = render.changed_keys(old, new)
+    generated = lock.load_lock(base_path)
+    outputs = [
+        (t_name, out_path) for t_name, out_path in render.affected_outputs(
+            session.plan(None, new), keys=keys,
+            previous=session.plan(None, old))
+        if out_path in generated
+        or os.path.exists(os.path.join(base_path, out_path))
+    ]
+    if not outputs:
+        logger.info(f"No generated file depends on {', '.join(sorted(keys))}.")
+        return {lock.WRITTEN: []}
+    if getattr(args, "dry_run", False) or getattr(args, "diff", False):
+        return check_outputs(outputs, new, args, logger=logger,
+                             base_path=base_path)
+    return session.generate_outputs(
+        outputs, context=new, base_path=base_path,
+        incremental=getattr(args, "incremental", False),
+        sink=get_sink(args, logger=logger),
+    )
+
+
+def get_session(args, logger=logger):
+    """Return RepoDocSession configured from the parsed CLI args."""
+    return RepoDocSession(
+        jobs=getattr(args, "jobs", 1),
+        fsync=getattr(args, "fsync", "none"),
+        use_daemon=getattr(args, "use_daemon", False),
+        engine=getattr(args, "engine", None) or "threads",
+        logger=logger,
+    )
+
+
+def get_sink(args, logger=logger):
+    """Return the --output-* sink, None to write into directories."""
+    from repodoc import sinks
+
+    if getattr(args, "output_archive", None):
+        return sinks.ArchiveSink(args.output_archive, logger=logger)
+    if getattr(args, "output_git", None) or getattr(
+        args, "output_fast_import", None
+    ):
+        return sinks.GitSink(
+            repo=args.output_git,
+            target=args.output_fast_import,
+            branch=args.git_branch,
+            message=args.git_message,
+            logger=logger,
+        )
+    return None
+
+
+def check_outputs(outputs, kwargs, args, logger=logger,
+                  base_path=os.path.abspath(os.path.curdir)):
+    """Render outputs and compare them with the files on disk.
+
+    Nothing is written. Changed paths are printed, or a unified diff with
+    ``--diff``, and added to ``args.drift`` so main can exit non-zero.
+
+    Return dict of {status: [output paths]}.
+    """
+    diff = getattr(args, "diff", False)
+    report, diffs = get_session(args, logger=logger).check_outputs(
+        outputs, context=kwargs, base_path=base_path, diff=diff,
+    )
+    for out_path in report[lock.WRITTEN]:
+        if diff:
+            print(diffs[out_path], end="")
+        else:
+            print(out_path)
+    if not hasattr(args, "drift"):
+        args.drift = []
+    args.drift.extend(report[lock.WRITTEN])
+    return report
+
+
+def check_group(group, kwargs, args, logger=logger, licence=None,
+                base_path=os.path.abspath(os.path.curdir)):
+    """Render group and compare it with the files on disk, writing nothing.
+
+    See check_outputs.
+    """
+    return check_outputs(
+        render.group_outputs(group, licence=licence), kwargs, args,
+        logger=logger, base_path=base_path,
+    )
+
+
+def generate_group(group, kwargs, args, logger=logger, licence=None,
+                   base_path=os.path.abspath(os.path.curdir)):
+    """Render and write every template of group with kwargs.
+
+    Thin wrapper over RepoDocSession.generate_group honouring ``--jobs``,
+    ``--fsync``, ``--incremental`` and ``--no-daemon``; ``--dry-run`` and
+    ``--diff`` hand over to check_group.
+
+    Return dict of {status: [output paths]}.
+    """
+    if getattr(args, "dry_run", False) or getattr(args, "diff", False):
+        return check_group(group, kwargs, args, logger=logger,
+                           licence=licence, base_path=base_path)
+    return get_session(args, logger=logger).generate_group(
+        group, context=kwargs, licence=licence, base_path=base_path,
+        incremental=getattr(args, "incremental", False),
+        sink=get_sink(args, logger=logger),
+    )
+
+
+def all_groups(args):
+    """Generate every template group enabled in the config in one pass."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    kwargs = config_from_file(args.config_file)
+    session = get_session(args, logger=logger)
+    if getattr(args, "dry_run", False) or getattr(args, "diff", False):
+        return check_outputs(
+            session.plan(args.groups, kwargs), kwargs, args, logger=logger)
+    return session.generate_plan(
+        args.groups, context=kwargs,
+        base_path=os.path.abspath(os.path.curdir),
+        incremental=getattr(args, "incremental", False),
+        sink=get_sink(args, logger=logger),
+    )
+
+
 def community_health(args):
     """Generate Community Health Guidelines."""
     logger = configure_logger(
@@ -205,11 +398,7 @@ def community_health(args):
             args.program_name,
         ]
         kwargs = dict(zip(ch_vars, ch_vals))
-    for t_name in render.CommunityHealth_Templates:
-        writer.write_rendered_template(
-            *render.render_template(t_name, logger=logger, **kwargs),
-            logger=logger,
-        )
+    generate_group("community_health", kwargs, args, logger=logger)
     return
 
 
@@ -220,15 +409,7 @@ def dot_files(args):
         debug_file=None,
     )
     kwargs = config_from_file(args.config_file)
-    for t_name in render.DotTemplates:
-        writer.write_rendered_template(
-            *render.render_template(
-                t_name,
-                logger=logger,
-                **kwargs,
-            ),
-            logger=logger,
-        )
+    generate_group("dot_files", kwargs, args, logger=logger)
     return
 
 
@@ -250,11 +431,7 @@ def sphinx_docs(args):
             args.version,
         ]
         kwargs = dict(zip(ch_vars, ch_vals))
-    for t_name in render.DocTemplates:
-        writer.write_rendered_template(
-            *render.render_template(t_name, logger=logger, **kwargs),
-            logger=logger,
-        )
+    generate_group("sphinx_docs", kwargs, args, logger=logger)
     return
 
 
@@ -264,6 +441,8 @@ def licence(args):
         stream_level="DEBUG" if args.verbose else "INFO",
         debug_file=None,
     )
+    if args.licence not in render.LicenceMap:
+        invalid_choice(args, "licence", args.licence, render.LicenceMap)
     if args.use_conf:
         kwargs = config_from_file(args.config_file)
     else:
@@ -275,10 +454,8 @@ def licence(args):
             args.program_name,
         ]
         kwargs = dict(zip(ch_vars, ch_vals))
-    writer.write_rendered_template(
-        *render.render_licence(args.licence, logger=logger, **kwargs),
-        logger=logger,
-    )
+    generate_group("licence", kwargs, args, logger=logger,
+                   licence=args.licence)
     return
 
 
@@ -298,13 +475,7 @@ def readme(args):
             args.repo_name,
         ]
         kwargs = dict(zip(ch_vars, ch_vals))
-    writer.write_rendered_template(
-        *render.render_readme(
-            logger=logger,
-            **kwargs,
-        ),
-        logger=logger,
-    )
+    generate_group("readme", kwargs, args, logger=logger)
     return
 
 
@@ -333,11 +504,7 @@ def pypi_project(args):
             args.version,
         ]
         kwargs = dict(zip(ch_vars, ch_vals))
-    for t_name in render.Pypi_Templates:
-        writer.write_rendered_template(
-            *render.render_template(t_name, logger=logger, **kwargs),
-            logger=logger,
-        )
+    generate_group("pypi_project", kwargs, args, logger=logger)
     return
 
 
@@ -350,12 +517,110 @@ def bump_version(args):
     return logger
 
 
+def load_answers(path):
+    """Return dict of config answers from a JSON or YAML file, '-' for stdin.
+
+    JSON is valid YAML, so both are read by the YAML loader. Scalars are
+    kept as written, as strings, so ``version: 1.10`` stays ``"1.10"``;
+    validate_answers converts bools.
+    """
+    try:
+        if path == "-":
+            data = yaml.load(sys.stdin, Loader=yaml.BaseLoader)
+        else:
+            with open(path) as af:
+                data = yaml.load(af, Loader=yaml.BaseLoader)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Could not parse answers from {path}: {e}")
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Answers in {path} are not a mapping.")
+    return data
+
+
+def env_answers(variables, environ=None):
+    """Return answers given as REPODOC_<VARIABLE> environment variables."""
+    environ = os.environ if environ is None else environ
+    answers = {}
+    for var in variables:
+        name = f"REPODOC_{var.upper()}"
+        if name in environ:
+            answers[var] = environ[name]
+    return answers
+
+
+_TRUE = ("1", "true", "t", "yes", "y", "on")
+_FALSE = ("0", "false", "f", "no", "n", "off")
+
+
+def validate_answers(context, answers):
+    """Return context updated with answers, every value checked in one pass.
+
+    Answers may set the variables of context and BoolVariables and
+    ListVariables; lists may be given as comma separated strings. An
+    unanswered licence defaults to the first choice, as when prompting.
+    Raise ValueError listing every invalid answer.
+    """
+    bool_values = BoolVariables + [
+        k for k, v in context.items() if isinstance(v, bool)]
+    list_values = ListVariables + [
+        k for k, v in context.items() if isinstance(v, list)]
+    licences = list(render.LicenceMap.keys())
+    known = set(context) | set(bool_values) | set(list_values)
+    errors = [f"{k}: unknown variable" for k in answers if k not in known]
+    context = dict(context)
+    context.update((k, v) for k, v in answers.items() if k in known)
+    if not context.get("licence"):
+        context["licence"] = licences[0]
+    for key, value in context.items():
+        if key in bool_values:
+            if isinstance(value, str) and value.lower() in _TRUE + _FALSE:
+                value = value.lower() in _TRUE
+            if not isinstance(value, bool):
+                errors.append(f"{key}: expected yes or no, got {value!r}")
+        elif key in list_values:
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(",")]
+            if not isinstance(value, list) or not all(
+                isinstance(v, str) for v in value
+            ):
+                errors.append(
+                    f"{key}: expected a list of strings, got {value!r}")
+        elif key == "licence":
+            if value not in licences:
+                errors.append(
+                    f"{key}: expected one of {', '.join(licences)},"
+                    f" got {value!r}"
+                )
+        elif not isinstance(value, str):
+            errors.append(f"{key}: expected a string, got {value!r}")
+        context[key] = value
+    if errors:
+        raise ValueError(
+            "Invalid answers:\n" + "\n".join(f"  {e}" for e in errors))
+    return context
+
+
 def configure(args):
-    """Return Configuration Dictionary."""
+    """Return Configuration Dictionary.
+
+    Prompts for every variable, unless --no-input or --answers is given in
+    which case all answers are taken from the answers file and REPODOC_*
+    environment variables, environment first.
+    """
     if args.use_conf:
         context = config_from_file(args.config_file)
     else:
         context = gen_default_context()
+    if args.no_input or args.answers:
+        answers = load_answers(args.answers) if args.answers else {}
+        answers.update(env_answers(
+            set(context) | set(BoolVariables) | set(ListVariables)))
+        return gen_config_file(
+            args.config_file, context=validate_answers(context, answers))
+    from repodoc import prompt
+
     bool_values = [k for k, v in context.items() if isinstance(v, bool)]
     list_values = [k for k, v in context.items() if isinstance(v, list)]
     for key, default in context.items():
@@ -370,7 +635,133 @@ def configure(args):
         else:
             context[key] = prompt.read_user_variable(key, default)
     # return context
-    return gen_config_file(context=context)
+    return gen_config_file(args.config_file, context=context)
+
+
+def cache_command(args):
+    """Manage the on-disk template and render caches."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    from repodoc import memo
+
+    if args.cache_action == "clear":
+        cache.clear()
+        return
+    if args.cache_action == "prune":
+        logger.info(f"Evicted {memo.evict()} renderings.")
+        return
+    print(f"cache_dir: {cache.cache_dir()}")
+    print(f"enabled: {cache.enabled()}")
+    print(yaml.dump(cache.stats(), Dumper=Dumper))
+    print(yaml.dump({"render_cache": memo.store_stats()}, Dumper=Dumper))
+    return
+
+
+def index_command(args):
+    """Rebuild the template variable index shipped with repodoc."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    index.write_index(
+        index.build_index(logger=logger),
+        filename=args.index_file,
+    )
+    return
+
+
+def batch_command(args):
+    """Render many repositories from a manifest in parallel."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    from repodoc import batch
+
+    jobs, settings = batch.load_manifest(args.manifest)
+    for job in jobs:
+        if args.groups:
+            job["groups"] = args.groups
+        if args.engine:
+            job["engine"] = args.engine
+        if args.fsync != "none":
+            job["fsync"] = args.fsync
+        job["dry_run"] = args.dry_run
+        job["diff"] = args.diff
+    summary = batch.run_batch(
+        jobs,
+        workers=args.workers or settings.get("workers"),
+        logger=logger,
+    )
+    for output, (paths, diffs) in sorted(summary["changes"].items()):
+        for out_path in paths:
+            if args.diff:
+                print(diffs[out_path], end="")
+            else:
+                print(os.path.join(output, out_path))
+        args.drift = getattr(args, "drift", []) + paths
+    verb = "Would change" if args.dry_run or args.diff else "Rendered"
+    logger.info(
+        f"{verb} {summary['files']} files for {summary['repos']} repos"
+        f" in {summary['seconds']:.2f}s"
+        f" ({summary['repos_per_second']:.1f} repos/s,"
+        f" {summary['files_per_second']:.1f} files/s),"
+        f" {len(summary['failures'])} failed."
+    )
+    if summary["failures"]:
+        raise SystemExit(1)
+    return summary
+
+
+def serve(args):
+    """Run a render daemon keeping templates compiled between requests."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    from repodoc import server
+
+    server.serve(args.socket or server.socket_path(), logger=logger)
+    return
+
+
+def watch_command(args):
+    """Regenerate outputs affected by config or template changes."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    from repodoc import watch
+
+    watch.watch(
+        get_session(args, logger=logger),
+        args.config_file,
+        groups=args.groups,
+        base_path=os.path.abspath(os.path.curdir),
+        debounce=args.debounce,
+        poll=args.poll,
+        interval=args.interval,
+        logger=logger,
+    )
+    return
+
+
+def compile_command(args):
+    """Precompile all templates into importable Python modules."""
+    logger = configure_logger(
+        stream_level="DEBUG" if args.verbose else "INFO",
+        debug_file=None,
+    )
+    from repodoc import compiled
+
+    compiled.compile_templates(
+        render.make_environment(),
+        target=args.compile_target or compiled.CompiledDir,
+        logger=logger,
+    )
+    return
 
 
 def usage(args, **kwargs):
@@ -446,6 +837,135 @@ def get_main_parser():
         dest="verbose",
         default=False,
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Render and write templates of a group with N threads.",
+        action="store",
+        dest="jobs",
+        type=int,
+        default=1,
+        metavar="N",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        help="Only regenerate files whose template or config changed,"
+        + " tracked in .repodoc.lock.",
+        action="store_true",
+        dest="incremental",
+        default=False,
+    )
+    parser.add_argument(
+        "--fsync",
+        help="fsync generated files: none, per file or once at the end.",
+        action="store",
+        dest="fsync",
+        choices=writer.FsyncModes,
+        default="none",
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        help="Print paths that would change, write nothing and exit 1 if"
+        + " any would.",
+        action="store_true",
+        dest="dry_run",
+        default=False,
+    )
+    parser.add_argument(
+        "-d",
+        "--diff",
+        help="Print a unified diff of what would change, write nothing and"
+        + " exit 1 if anything would.",
+        action="store_true",
+        dest="diff",
+        default=False,
+    )
+    parser.add_argument(
+        "--engine",
+        help="Render and write with threads (default) or an asyncio"
+        + " pipeline keeping --jobs (default 32) filesystem operations in"
+        + " flight, for NFS and other high latency filesystems.",
+        action="store",
+        dest="engine",
+        choices=Engines,
+        default=None,
+    )
+    parser.add_argument(
+        "--output-archive",
+        help="Write generated files into one tar (.tar, .tar.gz, .tgz,"
+        + " .tar.bz2, .tar.xz) or .zip archive instead of the current"
+        + " directory, '-' streams a tar to stdout.",
+        action="store",
+        dest="output_archive",
+        default=None,
+        metavar="ARCHIVE",
+    )
+    parser.add_argument(
+        "--output-git",
+        help="Commit generated files to --git-branch of the git repository"
+        + " REPO through git fast-import, leaving its working tree alone.",
+        action="store",
+        dest="output_git",
+        default=None,
+        metavar="REPO",
+    )
+    parser.add_argument(
+        "--output-fast-import",
+        help="Write generated files as a git fast-import stream to FILE,"
+        + " '-' for stdout.",
+        action="store",
+        dest="output_fast_import",
+        default=None,
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--git-branch",
+        help="Branch committed to by --output-git and --output-fast-import.",
+        action="store",
+        dest="git_branch",
+        default="main",
+    )
+    parser.add_argument(
+        "--git-message",
+        help="Commit message for --output-git and --output-fast-import.",
+        action="store",
+        dest="git_message",
+        default="Generate repository scaffold with repodoc.",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        help="Render in this process even if a repodoc daemon is running.",
+        action="store_false",
+        dest="use_daemon",
+        default=True,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Write a json report of wall time and tracemalloc peak per"
+        + " phase and template to --profile-output.",
+        action="store_true",
+        dest="profile",
+        default=False,
+    )
+    parser.add_argument(
+        "--profile-output",
+        help="With --profile, write the report to FILE (default"
+        + " repodoc-profile.json, '-' for stderr).",
+        action="store",
+        dest="profile_output",
+        default="repodoc-profile.json",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        help="With --profile, also write cProfile stats to FILE.",
+        action="store",
+        dest="profile_dump",
+        default=None,
+        metavar="FILE",
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -463,10 +983,9 @@ def get_main_parser():
     vp_grp.add_argument(
         "-t",
         "--template_name",
-        choices=render.TemplateNames,
         action="store",
         dest="template_name",
-        help="name of template e.g README.md or README.md.j2",
+        help="name of template e.g README.md or README.md.j2, see -l",
         metavar="Template_Name.ext.j2",
     )
     vp_grp.add_argument(
@@ -518,6 +1037,23 @@ def get_main_parser():
         help=gen_config_file.__doc__,
         action="store_true",
     )
+    config_parser.add_argument(
+        "--no-input",
+        help="with --init take every answer from REPODOC_<VARIABLE>"
+        + " environment variables and --answers instead of prompting",
+        action="store_true",
+        dest="no_input",
+        default=False,
+    )
+    config_parser.add_argument(
+        "--answers",
+        help="with --init read answers from a JSON or YAML file, '-' for"
+        + " stdin; implies --no-input",
+        action="store",
+        dest="answers",
+        metavar="FILE",
+        default=None,
+    )
     config_parser.add_argument(
         "--get",
         help="get value: name",
@@ -541,6 +1077,15 @@ def get_main_parser():
         metavar=("name", "value"),
         nargs=2,
     )
+    config_parser.add_argument(
+        "-r",
+        "--regenerate",
+        help="after --set or --add regenerate only the files in the current"
+        + " directory that depend on the changed variable",
+        action="store_true",
+        dest="regenerate",
+        default=False,
+    )
     # End config Subparser
     # Begin Licence Subparser
     licence_parser = subparsers.add_parser(
@@ -550,9 +1095,8 @@ def get_main_parser():
     licence_parser.set_defaults(func=licence)
     licence_parser.add_argument(
         "licence",
-        choices=list(render.LicenceMap.keys()),
         default="MIT",
-        help="Type of Licence to generate.",
+        help="Type of Licence to generate, e.g MIT, GPLv3 or APACHE.",
     )
     licence_parser.add_argument(
         "-a",
@@ -612,14 +1156,220 @@ def get_main_parser():
     )
     dot_files_parser.set_defaults(func=dot_files)
     # End dot_files Subparser
+    # Begin all Subparser
+    all_parser = subparsers.add_parser(
+        "all",
+        help=all_groups.__doc__,
+    )
+    all_parser.set_defaults(func=all_groups)
+    all_parser.add_argument(
+        "-g",
+        "--groups",
+        action="store",
+        dest="groups",
+        nargs="+",
+        choices=render.GroupNames,
+        default=None,
+        help="only generate these groups, defaults to the groups enabled"
+        + " by the pypi, create_docs and licence config values.",
+    )
+    # End all Subparser
+    # Begin cache Subparser
+    cache_parser = subparsers.add_parser(
+        "cache",
+        help=cache_command.__doc__,
+    )
+    cache_parser.set_defaults(func=cache_command)
+    cache_parser.add_argument(
+        "cache_action",
+        choices=["clear", "stats", "prune"],
+        help="clear the local cache, print cache locations, sizes and"
+        + " render cache hit/miss totals, or trim the render cache to"
+        + " $REPODOC_RENDER_CACHE_SIZE.",
+    )
+    # End cache Subparser
+    # Begin index Subparser
+    index_parser = subparsers.add_parser(
+        "index",
+        help=index_command.__doc__,
+    )
+    index_parser.set_defaults(func=index_command)
+    index_parser.add_argument(
+        "-o",
+        "--output",
+        action="store",
+        dest="index_file",
+        default=index.IndexFile,
+        help="index file to write.",
+    )
+    # End index Subparser
+    # Begin batch Subparser
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help=batch_command.__doc__,
+    )
+    batch_parser.set_defaults(func=batch_command)
+    batch_parser.add_argument(
+        "manifest",
+        help="YAML/JSON manifest file or directory of config files.",
+    )
+    batch_parser.add_argument(
+        "-w",
+        "--workers",
+        action="store",
+        dest="workers",
+        type=int,
+        default=None,
+        help="number of worker processes, defaults to the number of CPUs.",
+    )
+    batch_parser.add_argument(
+        "-g",
+        "--groups",
+        action="store",
+        dest="groups",
+        nargs="+",
+        choices=render.GroupNames,
+        default=None,
+        help="template groups to render, defaults to all groups.",
+    )
+    # End batch Subparser
+    # Begin serve Subparser
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help=serve.__doc__,
+    )
+    serve_parser.set_defaults(func=serve)
+    serve_parser.add_argument(
+        "-s",
+        "--socket",
+        action="store",
+        dest="socket",
+        default=None,
+        help="unix socket path, defaults to $REPODOC_SOCKET or"
+        + " $XDG_RUNTIME_DIR/repodoc.sock.",
+    )
+    # End serve Subparser
+    # Begin watch Subparser
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help=watch_command.__doc__,
+    )
+    watch_parser.set_defaults(func=watch_command)
+    watch_parser.add_argument(
+        "-g",
+        "--groups",
+        action="store",
+        dest="groups",
+        nargs="+",
+        choices=render.GroupNames,
+        default=None,
+        help="only watch these groups, defaults to the groups enabled by"
+        + " the config.",
+    )
+    watch_parser.add_argument(
+        "--debounce",
+        action="store",
+        dest="debounce",
+        type=float,
+        default=0.2,
+        metavar="SECONDS",
+        help="wait for SECONDS without events before regenerating.",
+    )
+    watch_parser.add_argument(
+        "--poll",
+        action="store_true",
+        dest="poll",
+        default=False,
+        help="poll modification times instead of using inotify.",
+    )
+    watch_parser.add_argument(
+        "--interval",
+        action="store",
+        dest="interval",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="polling interval.",
+    )
+    # End watch Subparser
+    # Begin compile Subparser
+    compile_parser = subparsers.add_parser(
+        "compile",
+        help=compile_command.__doc__,
+    )
+    compile_parser.set_defaults(func=compile_command)
+    compile_parser.add_argument(
+        "-o",
+        "--output",
+        action="store",
+        dest="compile_target",
+        default=None,
+        help="target directory, defaults to the _compiled package folder.",
+    )
+    # End compile Subparser
     return parser
 
 
+def run_profiled(args):
+    """Run args.func under profiling and write the --profile report."""
+    # Work done by a daemon would not show up in this process.
+    args.use_daemon = False
+    profiling.start(
+        cprofile=args.profile_dump,
+        import_started=repodoc._import_started,
+    )
+    try:
+        args.func(args)
+    finally:
+        profiling.write_report(profiling.stop(), args.profile_output)
+
+
 def main():
     """Run Main Entry Point."""
     parser = get_main_parser()
     args = parser.parse_args()
-    args.func(args)
+    outputs = [
+        flag for flag, value in (
+            ("--output-archive", args.output_archive),
+            ("--output-git", args.output_git),
+            ("--output-fast-import", args.output_fast_import),
+        ) if value
+    ]
+    if len(outputs) > 1:
+        parser.error(f"{' and '.join(outputs)} are mutually exclusive.")
+    if outputs and args.incremental:
+        parser.error(f"--incremental cannot write into {outputs[0]}.")
+    if args.output_git and not os.path.isdir(args.output_git):
+        parser.error(f"--output-git {args.output_git} is not a directory.")
+    if args.output_git:
+        from repodoc import sinks
+
+        if sinks.branch_ref(args.git_branch) in sinks.checked_out_branches(
+                args.output_git):
+            parser.error(
+                f"--git-branch {args.git_branch} is checked out in"
+                f" {args.output_git}, choose another branch.")
+    if args.output_archive not in (None, "-"):
+        from repodoc import sinks
+
+        try:
+            sinks.archive_format(args.output_archive)
+        except ValueError as e:
+            parser.error(str(e))
+    if (getattr(args, "no_input", False) or getattr(args, "answers", None)
+            ) and not args.init:
+        parser.error("--no-input and --answers only apply to --init.")
+    if "-" in (args.output_archive, args.output_fast_import):
+        # Keep stdout for the archive, logs and prints go to stderr.
+        sys.stdout = sys.stderr
+    if args.profile:
+        run_profiled(args)
+    else:
+        args.func(args)
+    if "repodoc.memo" in sys.modules:
+        sys.modules["repodoc.memo"].flush_stats()
+    if getattr(args, "drift", None):
+        raise SystemExit(1)
     return
 
 
@@ -0,0 +1,106 @@
+"""Ahead-of-time compiled templates.
+
+``repodoc compile`` (run it before building a wheel) turns every template
+into a Python module under ``repodoc/_compiled`` with
+``Environment.compile_templates`` and records the sha256 of each template
+source, along with the jinja2 and repodoc versions, in ``manifest.json``.
+At runtime ``PrecompiledLoader`` imports those modules, skipping lexing,
+parsing and code generation, and falls back to the source loader for any
+template that is missing or whose source no longer matches the manifest,
+and for every template when the modules were compiled by another jinja2 or
+repodoc release.
+"""
+import os
+import json
+import shutil
+import logging
+import jinja2
+import repodoc
+from repodoc import index
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "CompiledDir",
+    "ManifestFile",
+    "load_manifest",
+    "compile_templates",
+    "PrecompiledLoader",
+]
+
+CompiledDir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "_compiled")
+ManifestFile = "manifest.json"
+
+
+def _versions():
+    return {"jinja2": jinja2.__version__, "repodoc": repodoc.__version__}
+
+
+def load_manifest(target=CompiledDir, logger=logger):
+    """Return {template_name: source sha256} of compiled templates.
+
+    Empty when the templates were compiled by another jinja2 or repodoc.
+    """
+    try:
+        with open(os.path.join(target, ManifestFile)) as rf:
+            manifest = json.load(rf)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("versions") != _versions():
+        logger.debug(
+            f"{__name__}: ignoring templates compiled by"
+            f" {manifest.get('versions')}.")
+        return {}
+    return manifest.get("templates", {})
+
+
+def compile_templates(environment, target=CompiledDir, logger=logger):
+    """Compile all templates of environment into modules under target."""
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+    templates = environment.list_templates()
+    environment.compile_templates(
+        target,
+        zip=None,
+        log_function=logger.debug,
+        ignore_errors=False,
+    )
+    manifest = {t: index.source_hash(t) for t in templates}
+    with open(os.path.join(target, ManifestFile), "w") as wf:
+        json.dump({"versions": _versions(), "templates": manifest}, wf,
+                  indent=1, sort_keys=True)
+    logger.info(f"Compiled {len(templates)} templates into {target}.")
+    return manifest
+
+
+class PrecompiledLoader(jinja2.ModuleLoader):
+    """Load precompiled template modules, falling back to source_loader."""
+
+    def __init__(self, source_loader, target=CompiledDir, logger=logger):
+        super().__init__(target)
+        self.source_loader = source_loader
+        self.manifest = load_manifest(target, logger=logger)
+        self.logger = logger
+
+    def is_fresh(self, name):
+        """Return True if the compiled module of name matches its source."""
+        compiled_hash = self.manifest.get(name)
+        return compiled_hash is not None and compiled_hash == index.lookup(
+            name, logger=self.logger)["sha256"]
+
+    def load(self, environment, name, globals=None):
+        if self.is_fresh(name):
+            try:
+                return super().load(environment, name, globals)
+            except jinja2.TemplateNotFound:
+                pass
+        self.logger.debug(f"{__name__}: compiling {name} from source.")
+        return self.source_loader.load(environment, name, globals)
+
+    def get_source(self, environment, template):
+        return self.source_loader.get_source(environment, template)
+
+    def list_templates(self):
+        return self.source_loader.list_templates()
@@ -0,0 +1,247 @@
+"""Prebuilt index of template variables.
+
+``template_index.json`` ships with the package and maps every template name
+to the sha256 of its source, its undeclared variables, the templates it
+references and the ``now`` tag formats it uses. Lookups verify the source
+hash, so an edited template is reparsed once and the fresh entry is
+persisted in the user cache instead of parsing it again on every run.
+Regenerate the shipped index with ``repodoc index`` before building a
+release.
+"""
+import os
+import re
+import json
+import datetime
+import hashlib
+import logging
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "IndexFile",
+    "source_hash",
+    "build_entry",
+    "build_index",
+    "write_index",
+    "load_index",
+    "lookup",
+    "forget",
+    "dependencies",
+    "closure_hash",
+    "now_values",
+    "context_hash",
+]
+
+IndexFile = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "template_index.json")
+_NOW_TAG = re.compile(
+    r"""{%-?\s*now\s+["']([^"']*)["']\s*(?:,\s*["']([^"']*)["'])?""")
+# Any now tag, those _NOW_TAG cannot read make the clock use unknown.
+_ANY_NOW_TAG = re.compile(r"{%[-+]?\s*now\b")
+_index = None
+_verified = {}
+
+
+def source_hash(template_name):
+    """Return sha256 hexdigest of the template source file."""
+    from repodoc import render
+
+    with open(render.template_path(template_name), "rb") as tf:
+        return hashlib.sha256(tf.read()).hexdigest()
+
+
+def build_entry(template_name, logger=logger):
+    """Parse template_name and return its index entry."""
+    from repodoc import render
+
+    with open(render.template_path(template_name), "rb") as tf:
+        source = tf.read()
+    text = source.decode("utf-8")
+    now = [list(m) for m in _NOW_TAG.findall(text)]
+    return {
+        "sha256": hashlib.sha256(source).hexdigest(),
+        "variables": render.parse_variables(template_name, logger=logger),
+        "includes": render.parse_references(template_name, logger=logger),
+        "now": now if len(now) == len(_ANY_NOW_TAG.findall(text)) else None,
+    }
+
+
+def build_index(Templates=None, logger=logger):
+    """Return index dict for Templates (all templates by default)."""
+    from repodoc import render
+
+    if Templates is None:
+        Templates = render.Templates
+    return {t: build_entry(t, logger=logger) for t in Templates}
+
+
+def write_index(index, filename=IndexFile):
+    """Write index dict to filename as json."""
+    with open(filename, "w") as wf:
+        json.dump(index, wf, indent=1, sort_keys=True)
+        wf.write("\n")
+    logger.info(f"Written {filename}.")
+
+
+def _cache_file():
+    from repodoc import cache
+
+    return os.path.join(cache.version_dir("index"), "template_index.json")
+
+
+def load_index():
+    """Return the shipped index updated with entries cached by this user."""
+    global _index
+    if _index is not None:
+        return _index
+    _index = {}
+    filenames = [IndexFile]
+    from repodoc import cache
+
+    if cache.enabled():
+        try:
+            filenames.append(_cache_file())
+        except OSError:
+            pass
+    for filename in filenames:
+        try:
+            with open(filename) as rf:
+                _index.update(json.load(rf))
+        except (OSError, ValueError):
+            continue
+    return _index
+
+
+def _persist(template_name, entry, logger=logger):
+    """Save a freshly built entry in the user cache index."""
+    from repodoc import cache
+
+    if not cache.enabled():
+        return
+    try:
+        filename = _cache_file()
+        try:
+            with open(filename) as rf:
+                cached = json.load(rf)
+        except (OSError, ValueError):
+            cached = {}
+        cached[template_name] = entry
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "w") as wf:
+            json.dump(cached, wf, sort_keys=True)
+        os.replace(tmp_filename, filename)
+    except OSError as e:
+        logger.debug(f"{__name__}: could not persist index entry: {e}.")
+
+
+def lookup(template_name, logger=logger):
+    """Return verified index entry for template_name, rebuilding if stale."""
+    entry = _verified.get(template_name)
+    if entry is not None:
+        return entry
+    index = load_index()
+    entry = index.get(template_name)
+    if (entry is None or "includes" not in entry
+            or entry.get("sha256") != source_hash(template_name)):
+        logger.debug(f"{__name__}: reindexing stale {template_name}.")
+        entry = index[template_name] = build_entry(
+            template_name, logger=logger)
+        _persist(template_name, entry, logger=logger)
+    _verified[template_name] = entry
+    return entry
+
+
+def forget(template_name=None):
+    """Drop verified entries so the next lookup re-hashes the source."""
+    if template_name is None:
+        _verified.clear()
+    else:
+        _verified.pop(template_name, None)
+
+
+def dependencies(template_name, logger=logger):
+    """Return template_name and every template it references, recursively.
+
+    Return None when the closure cannot be known before rendering: a
+    reference is computed at render time or missing, or a ``now`` tag
+    could not be read.
+    """
+    closure = []
+    pending = [template_name]
+    while pending:
+        name = pending.pop()
+        if name in closure:
+            continue
+        try:
+            entry = lookup(name, logger=logger)
+        except OSError:
+            return None
+        if entry["includes"] is None or entry["now"] is None:
+            return None
+        closure.append(name)
+        pending.extend(entry["includes"])
+    return sorted(closure)
+
+
+def closure_hash(template_name, logger=logger):
+    """Return sha256 over the sources of the dependencies of template_name.
+
+    Return None when its dependencies are unknown, see dependencies.
+    """
+    closure = dependencies(template_name, logger=logger)
+    if closure is None:
+        return None
+    if closure == [template_name]:
+        return lookup(template_name, logger=logger)["sha256"]
+    digest = hashlib.sha256()
+    for name in closure:
+        sha = lookup(name, logger=logger)["sha256"]
+        digest.update(f"{name}:{sha}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def now_values(template_name, logger=logger):
+    """Return current values of the ``now`` tags used by template_name."""
+    entry = lookup(template_name, logger=logger)
+    if not entry["now"]:
+        return []
+    return [
+        _now(timezone).strftime(datetime_format or "%Y-%m-%d")
+        for timezone, datetime_format in entry["now"]
+    ]
+
+
+def _now(timezone):
+    """Return aware current datetime in timezone as jinja2_time does.
+
+    ``utc`` and ``local`` avoid arrow, which is several times slower.
+    """
+    if timezone == "utc":
+        return datetime.datetime.now(datetime.timezone.utc)
+    if timezone == "local":
+        return datetime.datetime.now().astimezone()
+    import arrow
+
+    return arrow.now(timezone)
+
+
+def context_hash(template_name, kwargs, clock=True, logger=logger):
+    """Return sha256 of the parts of kwargs template_name depends on.
+
+    Only the variables the template and its dependencies reference and,
+    with clock, the current values of their ``now`` tags are hashed, so
+    unrelated config changes or the clock ticking within a format's
+    resolution do not change the result.
+    """
+    closure = dependencies(template_name, logger=logger) or [template_name]
+    variables = set()
+    for name in closure:
+        variables.update(lookup(name, logger=logger)["variables"])
+    data = {"variables": {v: kwargs.get(v) for v in sorted(variables)}}
+    if clock:
+        data["now"] = [
+            value for name in closure
+            for value in now_values(name, logger=logger)
+        ]
+    encoded = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,134 @@
+"""Content-hash lock manifest for incremental generation.
+
+``.repodoc.lock`` records, for every generated path, the hash of the
+template source, of the context values it uses and of the written output.
+An output whose template and context hashes are unchanged, and whose file
+on disk still matches the recorded output, is skipped without rendering.
+A file changed on disk since it was generated is reported as a conflict
+and left untouched. Non-incremental runs into a directory holding a lock
+file refresh the entries of the outputs they write, so those are not
+reported as conflicts later.
+
+The context hash leaves out the values of ``now`` tags, so a date or time
+rendered into an output does not make it stale on its own; it is refreshed
+when the output is regenerated for another reason.
+"""
+import os
+import json
+import hashlib
+import logging
+from repodoc import index
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "LockFile",
+    "WRITTEN",
+    "SKIPPED",
+    "CONFLICT",
+    "load_lock",
+    "save_lock",
+    "file_state",
+    "content_hash",
+    "input_hashes",
+    "plan_output",
+    "make_entry",
+    "stamp_entry",
+]
+
+LockFile = ".repodoc.lock"
+WRITTEN = "written"
+SKIPPED = "skipped"
+CONFLICT = "conflict"
+
+
+def load_lock(base_path=os.path.abspath(os.path.curdir)):
+    """Return {path: entry} recorded in the lock file under base_path."""
+    try:
+        with open(os.path.join(base_path, LockFile)) as rf:
+            return json.load(rf).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_lock(files, base_path=os.path.abspath(os.path.curdir)):
+    """Atomically write {path: entry} to the lock file under base_path."""
+    filename = os.path.join(base_path, LockFile)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, "w") as wf:
+        json.dump({"version": 1, "files": files}, wf, indent=1,
+                  sort_keys=True)
+        wf.write("\n")
+    os.replace(tmp_filename, filename)
+
+
+def content_hash(content):
+    """Return sha256 hexdigest of str or bytes content."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_state(path, entry=None):
+    """Return (sha256, size, mtime_ns) of path or None when missing.
+
+    When entry recorded the same size and mtime the file is not reread.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if (entry and entry.get("size") == st.st_size
+            and entry.get("mtime_ns") == st.st_mtime_ns):
+        return (entry["output"], st.st_size, st.st_mtime_ns)
+    with open(path, "rb") as rf:
+        digest = hashlib.sha256(rf.read()).hexdigest()
+    return (digest, st.st_size, st.st_mtime_ns)
+
+
+def input_hashes(template_name, kwargs, logger=logger):
+    """Return (template_hash, ctx_hash) recorded for template_name.
+
+    template_hash covers the templates template_name includes, extends or
+    imports; it is None when those are unknown before rendering.
+    """
+    return (
+        index.closure_hash(template_name, logger=logger),
+        index.context_hash(template_name, kwargs, clock=False, logger=logger),
+    )
+
+
+def plan_output(template_name, kwargs, entry, path, logger=logger):
+    """Return (status, template_hash, ctx_hash, disk_state) before render.
+
+    status is SKIPPED when nothing changed, CONFLICT when the file on disk
+    was modified since it was generated, else None (render needed). An
+    output whose template_hash is None is always rendered.
+    """
+    template_hash, ctx_hash = input_hashes(
+        template_name, kwargs, logger=logger)
+    disk = file_state(path, entry)
+    if entry and disk is not None and disk[0] != entry["output"]:
+        return (CONFLICT, template_hash, ctx_hash, disk)
+    if (entry and disk is not None and template_hash is not None
+            and entry["template"] == template_hash
+            and entry["context"] == ctx_hash):
+        return (SKIPPED, template_hash, ctx_hash, disk)
+    return (None, template_hash, ctx_hash, disk)
+
+
+def make_entry(template_name, template_hash, ctx_hash, output_hash):
+    """Return lock entry for a freshly rendered output."""
+    return {
+        "template_name": template_name,
+        "template": template_hash,
+        "context": ctx_hash,
+        "output": output_hash,
+    }
+
+
+def stamp_entry(entry, path):
+    """Record size and mtime of the file at path in entry, return entry."""
+    st = os.stat(path)
+    entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+    return entry
@@ -49,3 +49,44 @@ def configure_logger(stream_level="DEBUG", debug_file=None):
     logger.addHandler(stream_handler)
 
     return logger
+
+
+class _RecordListHandler(logging.Handler):
+    """Handler appending every record to a list."""
+
+    def __init__(self, records):
+        super().__init__(level=logging.DEBUG)
+        self.records = records
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def buffered_logger(name="repodoc"):
+    """Return (logger, records) where logger only stores its records.
+
+    Used by concurrent workers so their log output can be replayed in a
+    deterministic order by the caller with ``replay_records``.
+    """
+    records = []
+    buffered = logging.Logger(name, level=logging.DEBUG)
+    buffered.addHandler(_RecordListHandler(records))
+    return buffered, records
+
+
+def quiet_logger(name="repodoc"):
+    """Return a logger discarding its records.
+
+    Used by long-lived objects, such as the daemon's shared session, whose
+    records would otherwise accumulate.
+    """
+    quiet = logging.Logger(name)
+    quiet.addHandler(logging.NullHandler())
+    return quiet
+
+
+def replay_records(records, logger):
+    """Emit records collected by a buffered logger through logger."""
+    for record in records:
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
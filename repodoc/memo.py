@@ -0,0 +1,462 @@
+"""Content-addressed render cache.
+
+A rendering is addressed by the repodoc version, the source hashes of the
+template and of every template it includes, extends or imports, and
+``index.context_hash``, i.e. the values of the variables those templates
+actually reference and of their ``now`` tags. Templates with references
+computed at render time are not cached. Renderings are kept in an
+in-memory LRU and in a store directory, ``$REPODOC_RENDER_CACHE_DIR`` if set
+(it may sit on storage shared between hosts) else ``renders`` under the
+cache directory. Entries are sharded by the first two hex digits of their
+key and written to a unique temporary file then renamed into place, so
+concurrent writers on several hosts are safe. Every entry starts with a
+header holding the sha256 and size of the rendering, and entries failing
+that check are treated as misses.
+
+Hits refresh an entry's mtime and ``evict`` removes the least recently used
+entries once the store exceeds ``$REPODOC_RENDER_CACHE_SIZE`` bytes
+(default 64 MiB). Hit and miss counters are accumulated in ``stats.json``
+of the store by ``flush_stats``, under a lock where ``fcntl`` is
+available. ``REPODOC_NO_CACHE=1`` disables the store, the in-memory LRU
+stays active.
+"""
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import contextlib
+import collections
+import repodoc
+from repodoc import cache
+from repodoc import index
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "MaxEntries",
+    "DefaultMaxBytes",
+    "StatsFile",
+    "EvictInterval",
+    "HeaderSize",
+    "stats",
+    "store_dir",
+    "max_bytes",
+    "render_key",
+    "get",
+    "put",
+    "render",
+    "stream",
+    "evict",
+    "flush_stats",
+    "store_stats",
+    "clear",
+]
+
+MaxEntries = 256
+DefaultMaxBytes = 64 << 20
+StatsFile = "stats.json"
+stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+_flushed = dict.fromkeys(stats, 0)
+# Seconds between eviction scans of the store, shared by all processes
+# through the mtime of _EVICT_MARKER.
+EvictInterval = 60.0
+_EVICT_MARKER = ".last-evict"
+# Temporary files older than this were left by a crashed writer.
+_STALE_TMP = 3600.0
+# "<sha256 hex> <size, 16 digits>\n"
+HeaderSize = 82
+ReadSize = 1 << 16
+_lru = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def store_dir():
+    """Return the render cache store directory, None when disabled."""
+    if not cache.enabled():
+        return None
+    return os.environ.get("REPODOC_RENDER_CACHE_DIR") or os.path.join(
+        cache.cache_dir(), "renders")
+
+
+def max_bytes():
+    """Return the size bound of the store in bytes."""
+    return int(os.environ.get("REPODOC_RENDER_CACHE_SIZE", DefaultMaxBytes))
+
+
+def _count(name):
+    with _lock:
+        stats[name] += 1
+
+
+def render_key(template_name, kwargs, logger=logger):
+    """Return content address of template_name rendered with kwargs.
+
+    The address covers every template it includes, extends or imports.
+    Return None when those are unknown before rendering, see
+    index.dependencies, so the rendering is not cached.
+    """
+    t_hash = index.closure_hash(template_name, logger=logger)
+    if t_hash is None:
+        return None
+    ctx_hash = index.context_hash(template_name, kwargs, logger=logger)
+    address = f"{repodoc.__version__}:{t_hash}:{ctx_hash}"
+    return hashlib.sha256(address.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    """Return store path of key, None when the store is disabled."""
+    root = store_dir()
+    if root is None:
+        return None
+    return os.path.join(root, key[:2], key)
+
+
+def _header(digest, size):
+    return b"%s %016d\n" % (digest.encode("ascii"), size)
+
+
+def _read_entry(path):
+    """Return verified content bytes of the entry at path, else None."""
+    try:
+        with open(path, "rb") as rf:
+            header = rf.read(HeaderSize)
+            data = rf.read()
+    except OSError:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    if header != _header(digest, len(data)):
+        return None
+    return data
+
+
+def _open_entry(path):
+    """Return the entry file at path positioned after its header.
+
+    The content is verified in ReadSize blocks first. Return None when the
+    entry is missing or fails the check.
+    """
+    try:
+        rf = open(path, "rb")
+    except OSError:
+        return None
+    try:
+        header = rf.read(HeaderSize)
+        size = os.fstat(rf.fileno()).st_size - HeaderSize
+        digest = hashlib.sha256()
+        for block in iter(lambda: rf.read(ReadSize), b""):
+            digest.update(block)
+        if header == _header(digest.hexdigest(), size):
+            rf.seek(HeaderSize)
+            return rf
+    except OSError:
+        pass
+    rf.close()
+    return None
+
+
+def _read_chunks(rf):
+    """Yield the text of entry file rf in chunks of ReadSize characters."""
+    with rf:
+        text = io.TextIOWrapper(rf, encoding="utf-8", newline="")
+        yield from iter(lambda: text.read(ReadSize), "")
+
+
+def _touch(path):
+    """Mark the entry at path as recently used, if the store allows it."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _mkstemp(dirname):
+    """Return (fd, path) of a new temporary file readable as umask allows.
+
+    The store may be shared, so the file is not left private to this user.
+    """
+    fd, path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=dirname)
+    umask = os.umask(0)
+    os.umask(umask)
+    try:
+        os.chmod(path, 0o666 & ~umask)
+    except OSError:
+        os.close(fd)
+        os.remove(path)
+        raise
+    return fd, path
+
+
+def _tee(key, chunks, logger=logger):
+    """Yield str chunks, storing them as the entry of key once exhausted.
+
+    Failing to store never interrupts the chunks.
+    """
+    path = _entry_path(key)
+    wf = None
+    if path is not None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = _mkstemp(os.path.dirname(path))
+            wf = os.fdopen(fd, "wb")
+            wf.write(_header("0" * 64, 0))
+        except OSError as e:
+            logger.debug(f"{__name__}: could not store {key}: {e}.")
+            path = None
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        for chunk in chunks:
+            if wf is not None:
+                data = chunk.encode("utf-8")
+                digest.update(data)
+                size += len(data)
+                try:
+                    wf.write(data)
+                except OSError as e:
+                    logger.debug(f"{__name__}: could not store {key}: {e}.")
+                    with contextlib.suppress(OSError):
+                        wf.close()
+                    wf = None
+            yield chunk
+        if wf is not None:
+            try:
+                wf.seek(0)
+                wf.write(_header(digest.hexdigest(), size))
+                wf.close()
+                wf = None
+                os.replace(tmp_path, path)
+                path = None
+            except OSError as e:
+                logger.debug(f"{__name__}: could not store {key}: {e}.")
+    finally:
+        if wf is not None:
+            wf.close()
+        if path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+
+def _remember(key, content):
+    with _lock:
+        _lru[key] = content
+        _lru.move_to_end(key)
+        while len(_lru) > MaxEntries:
+            _lru.popitem(last=False)
+
+
+def get(key):
+    """Return cached rendering for key or None."""
+    with _lock:
+        content = _lru.get(key)
+        if content is not None:
+            _lru.move_to_end(key)
+            stats["memory_hits"] += 1
+            return content
+    path = _entry_path(key)
+    if path is None:
+        return None
+    data = _read_entry(path)
+    if data is None:
+        return None
+    _touch(path)
+    content = data.decode("utf-8")
+    _count("disk_hits")
+    _remember(key, content)
+    return content
+
+
+def put(key, content, logger=logger):
+    """Store content under key in memory and in the store."""
+    _remember(key, content)
+    for _ in _tee(key, [content], logger=logger):
+        pass
+
+
+def render(template_name, kwargs, render_func, logger=logger):
+    """Return render_func() cached for template_name and kwargs."""
+    key = render_key(template_name, kwargs, logger=logger)
+    if key is None:
+        return render_func()
+    content = get(key)
+    if content is not None:
+        logger.debug(f"{__name__}: reused {template_name} ({key[:12]}).")
+        return content
+    _count("misses")
+    content = render_func()
+    put(key, content, logger=logger)
+    return content
+
+
+def stream(template_name, kwargs, generate, logger=logger):
+    """Return iterator of the str chunks of generate() cached like render.
+
+    Hits are read from the store in chunks and misses are copied into the
+    store as they are consumed, so large renderings are never held in
+    memory as a whole.
+    """
+    key = render_key(template_name, kwargs, logger=logger)
+    if key is None:
+        return generate()
+    with _lock:
+        content = _lru.get(key)
+        if content is not None:
+            _lru.move_to_end(key)
+            stats["memory_hits"] += 1
+    if content is not None:
+        return iter([content])
+    path = _entry_path(key)
+    rf = _open_entry(path) if path is not None else None
+    if rf is not None:
+        _touch(path)
+        _count("disk_hits")
+        logger.debug(f"{__name__}: reused {template_name} ({key[:12]}).")
+        return _read_chunks(rf)
+    _count("misses")
+    return _tee(key, generate(), logger=logger)
+
+
+def _entries(root):
+    """Return list of (mtime, size, path) of every stored entry.
+
+    Temporary files abandoned by crashed writers count as entries so that
+    eviction removes them.
+    """
+    entries = []
+    stale = time.time() - _STALE_TMP
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if entry.name.endswith(".tmp") and st.st_mtime > stale:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    return entries
+
+
+def evict(limit=None, logger=logger):
+    """Remove least recently used entries above limit bytes.
+
+    The store is trimmed to 90% of limit, defaulting to max_bytes, to
+    avoid evicting on every run. Return number of entries removed.
+    """
+    root = store_dir()
+    if root is None or not os.path.isdir(root):
+        return 0
+    limit = max_bytes() if limit is None else limit
+    entries = _entries(root)
+    total = sum(size for _, size, _ in entries)
+    if total <= limit:
+        return 0
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= limit * 0.9:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    with _lock:
+        stats["evictions"] += removed
+    logger.debug(f"{__name__}: evicted {removed} entries from {root}.")
+    return removed
+
+
+def _evict_due(root):
+    """Return True, and record it, if no process evicted recently."""
+    marker = os.path.join(root, _EVICT_MARKER)
+    try:
+        if time.time() - os.stat(marker).st_mtime < EvictInterval:
+            return False
+    except OSError:
+        pass
+    try:
+        with open(marker, "a"):
+            pass
+        os.utime(marker)
+    except OSError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def _locked(filename):
+    """Hold an exclusive lock on filename.lock where fcntl is available."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(f"{filename}.lock", "a") as lf:
+        fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+
+def flush_stats(logger=logger):
+    """Add counters gathered since the last flush to the store stats file.
+
+    Also evicts when this process stored new renderings, at most once every
+    EvictInterval seconds across all processes using the store.
+    """
+    root = store_dir()
+    with _lock:
+        delta = {k: stats[k] - _flushed[k] for k in stats}
+        _flushed.update(stats)
+    if root is None or not any(delta.values()):
+        return
+    filename = os.path.join(root, StatsFile)
+    try:
+        os.makedirs(root, exist_ok=True)
+        if delta["misses"] and _evict_due(root):
+            delta["evictions"] += evict(logger=logger)
+            with _lock:
+                _flushed["evictions"] = stats["evictions"]
+        with _locked(filename):
+            try:
+                with open(filename) as rf:
+                    totals = json.load(rf)
+            except (OSError, ValueError):
+                totals = {}
+            for k, v in delta.items():
+                totals[k] = totals.get(k, 0) + v
+            fd, tmp_filename = _mkstemp(root)
+            with os.fdopen(fd, "w") as wf:
+                json.dump(totals, wf, sort_keys=True)
+            os.replace(tmp_filename, filename)
+    except OSError as e:
+        logger.debug(f"{__name__}: could not save stats: {e}.")
+
+
+def store_stats():
+    """Return dict of store location, size, entries and hit/miss totals."""
+    root = store_dir()
+    result = {"store": root, "max_bytes": max_bytes()}
+    if root is None or not os.path.isdir(root):
+        return result
+    entries = _entries(root)
+    result["entries"] = len(entries)
+    result["bytes"] = sum(size for _, size, _ in entries)
+    try:
+        with open(os.path.join(root, StatsFile)) as rf:
+            result.update(json.load(rf))
+    except (OSError, ValueError):
+        pass
+    return result
+
+
+def clear():
+    """Forget the in-memory entries."""
+    with _lock:
+        _lru.clear()
@@ -0,0 +1,202 @@
+"""Per phase wall time and memory profiling for ``repodoc --profile``.
+
+Instrumented code wraps its work in ``phase(name, key)``. While profiling is
+inactive ``phase`` returns a shared no-op context manager, so the hooks cost
+one global lookup per call.
+
+Wall times are exclusive: time spent in a nested phase (rendering chunks
+consumed by a write, say) is counted for the inner phase only, so the phase
+totals add up to the profiled run. Memory peaks are tracemalloc peaks above
+the traced size at phase entry and are process wide, so runs with ``--jobs``
+give approximate figures per phase. Python before 3.9 lacks
+``tracemalloc.reset_peak``; there the traced size at phase exit stands in
+for the peak.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+import tracemalloc
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "Phases",
+    "active",
+    "start",
+    "stop",
+    "write_report",
+    "phase",
+    "iter_phase",
+]
+
+Phases = [
+    "import",
+    "config_load",
+    "discovery",
+    "get_variables",
+    "render",
+    "write",
+]
+
+_NULL = contextlib.nullcontext()
+_state = None
+_reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+
+def _peak():
+    """Return the traced peak since the last reset, see module docstring."""
+    current, peak = tracemalloc.get_traced_memory()
+    return peak if _reset_peak is not None else current
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.phases = {}
+        self.started = time.perf_counter()
+        self.cprofile = None
+
+    def stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            return self.local.stack
+
+    def record(self, name, key, wall, peak, calls=1):
+        with self.lock:
+            stats = self.phases.setdefault(name, _new_stats())
+            _add(stats, wall, peak, calls)
+            if key is not None:
+                _add(stats["items"].setdefault(key, _new_stats(False)),
+                     wall, peak, calls)
+
+
+def _new_stats(items=True):
+    stats = {"calls": 0, "wall": 0.0, "tracemalloc_peak": 0}
+    if items:
+        stats["items"] = {}
+    return stats
+
+
+def _add(stats, wall, peak, calls):
+    stats["calls"] += calls
+    stats["wall"] += wall
+    stats["tracemalloc_peak"] = max(stats["tracemalloc_peak"], peak)
+
+
+def active():
+    """Return True while a profile is being recorded."""
+    return _state is not None
+
+
+def start(cprofile=None, import_started=None):
+    """Start recording phases, and a cProfile dump if cprofile is a path.
+
+    import_started is the perf_counter value taken when repodoc was first
+    imported, recorded as the import phase.
+    """
+    global _state
+    _state = _State()
+    if import_started is not None:
+        _state.record("import", None, _state.started - import_started, 0)
+    tracemalloc.start()
+    if cprofile:
+        import cProfile
+
+        _state.cprofile = (cprofile, cProfile.Profile())
+        _state.cprofile[1].enable()
+
+
+def stop(logger=logger):
+    """Stop recording, return report dict."""
+    global _state
+    state, _state = _state, None
+    if state is None:
+        return None
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if state.cprofile:
+        path, profiler = state.cprofile
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info(f"Written cProfile stats to {path}.")
+    return {
+        "total": {
+            "wall": time.perf_counter() - state.started,
+            "tracemalloc_peak": peak,
+        },
+        "phases": {
+            name: state.phases[name]
+            for name in sorted(state.phases, key=_phase_order)
+        },
+        "cprofile": state.cprofile[0] if state.cprofile else None,
+    }
+
+
+def _phase_order(name):
+    return (Phases.index(name) if name in Phases else len(Phases), name)
+
+
+def write_report(report, path, logger=logger):
+    """Write report as json to path, '-' for stderr."""
+    data = json.dumps(report, indent=1)
+    if path == "-":
+        import sys
+
+        sys.stderr.write(data + "\n")
+        return
+    with open(os.path.abspath(path), "w") as wf:
+        wf.write(data + "\n")
+    logger.info(f"Written profile report to {path}.")
+
+
+@contextlib.contextmanager
+def _phase(state, name, key, calls=1):
+    stack = state.stack()
+    if stack:
+        parent = stack[-1]
+        parent[2] = max(parent[2], _peak())
+    if _reset_peak is not None:
+        _reset_peak()
+    # [start, traced at entry, peak seen, time in nested phases]
+    frame = [time.perf_counter(), tracemalloc.get_traced_memory()[0], 0, 0.0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        wall = time.perf_counter() - frame[0]
+        peak = max(frame[2], _peak())
+        state.record(name, key, wall - frame[3], max(0, peak - frame[1]),
+                     calls)
+        if stack:
+            stack[-1][2] = max(stack[-1][2], peak)
+            stack[-1][3] += wall
+
+
+def phase(name, key=None, calls=1):
+    """Return context manager timing a phase name, per key if given."""
+    state = _state
+    if state is None:
+        return _NULL
+    return _phase(state, name, key, calls)
+
+
+def iter_phase(name, key, iterable):
+    """Yield from iterable, timing each step as one call of phase name."""
+    iterator = iter(iterable)
+    calls = 1
+    while True:
+        with phase(name, key, calls):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                calls = 0
+        yield item
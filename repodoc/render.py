@@ -1,53 +1,403 @@
-"""Jinja2 template renderer."""
-import jinja2
-import jinja2.meta
+"""Jinja2 template renderer.
+
+Template discovery and the Jinja2 environment are built lazily on first
+attribute access (``render.Environment``, ``render.LicenceMap`` ...), so that
+importing repodoc does not pay for jinja2 or for walking the templates tree
+until a subcommand actually needs them.
+
+Templates are searched in layers, see ``template_dirs``: a template found in
+a user or org directory overrides the built-in one of the same name and new
+names join the group of their folder (``licences/``, ``docs/``,
+``.github/`` or the root).
+"""
+import os
 import logging
 
+from repodoc.profiling import phase, iter_phase, active
+
 logger = logging.getLogger("repodoc")
-Loader = jinja2.PackageLoader(package_name="repodoc", package_path="templates")
-Environment = jinja2.Environment(
-    loader=Loader,
-    extensions=[
-        "jinja2_time.TimeExtension",
+TemplatesDir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "templates")
+Pypi_Templates = ["MANIFEST.in.j2", "setup.cfg.j2", "setup.py.j2"]
+
+
+def template_dirs():
+    """Return the template search path, first match wins.
+
+    User dirs (``$REPODOC_TEMPLATE_PATH``, then
+    ``$XDG_CONFIG_HOME/repodoc/templates``), then org dirs
+    (``$REPODOC_ORG_TEMPLATE_PATH``, then ``/etc/repodoc/templates``), then
+    the built-in TemplatesDir. Missing directories are left out.
+    """
+    xdg_config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config")
+    layers = (
+        os.environ.get("REPODOC_TEMPLATE_PATH", "").split(os.pathsep)
+        + [os.path.join(xdg_config, "repodoc", "templates")]
+        + os.environ.get("REPODOC_ORG_TEMPLATE_PATH", "").split(os.pathsep)
+        + [os.path.join(os.sep, "etc", "repodoc", "templates")]
+    )
+    dirs = []
+    for path in filter(None, layers):
+        path = os.path.abspath(path)
+        if path in dirs or path == TemplatesDir:
+            continue
+        if os.path.isdir(path):
+            dirs.append(path)
+    return dirs + [TemplatesDir]
+
+
+def _scan(dirs):
+    """Return (sorted template names, {directory: mtime_ns}) over dirs."""
+    found = set()
+    mtimes = {}
+    for top in dirs:
+        for dirpath, _, filenames in os.walk(top):
+            mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+            rel = os.path.relpath(dirpath, top)
+            prefix = [] if rel == os.path.curdir else rel.split(os.path.sep)
+            found.update("/".join(prefix + [f]) for f in filenames)
+    return sorted(found), mtimes
+
+
+def _classify(templates):
+    """Return {attribute: template names} for the discovery attributes."""
+    def under(folder):
+        return [x for x in templates if x.startswith(folder + "/")]
+
+    root = [x for x in templates if "/" not in x]
+    return {
+        "Templates": templates,
+        "LicenceTemplates": under("licences"),
+        "DocTemplates": under("docs") + [
+            x for x in root if x == ".readthedocs.yaml.j2"],
+        "CommunityHealth_Templates": under(".github"),
+        "RootTemplates": root,
+        "DotTemplates": [x for x in root if x.startswith(".")],
+    }
+
+
+def _discovery_file():
+    from repodoc import cache
+
+    if not cache.enabled():
+        return None
+    try:
+        return os.path.join(cache.version_dir("discovery"), "index.json")
+    except OSError:
+        return None
+
+
+def _discover(logger=logger):
+    """Return classified templates of the search path.
+
+    The result is persisted in the cache directory and reused while the
+    search path and the mtime of every directory in it are unchanged, so
+    runs do not walk the template trees.
+    """
+    import json
+
+    dirs = _lazy("TemplateDirs")
+    filename = _discovery_file()
+    if filename is not None:
+        try:
+            with open(filename) as rf:
+                cached = json.load(rf)
+            if cached["dirs"] == dirs and all(
+                os.stat(path).st_mtime_ns == mtime
+                for path, mtime in cached["mtimes"].items()
+            ):
+                return cached["groups"]
+        except (OSError, ValueError, KeyError):
+            pass
+    templates, mtimes = _scan(dirs)
+    groups = _classify(templates)
+    if filename is not None:
+        try:
+            tmp_filename = f"{filename}.{os.getpid()}.tmp"
+            with open(tmp_filename, "w") as wf:
+                json.dump({"dirs": dirs, "mtimes": mtimes, "groups": groups},
+                          wf)
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            logger.debug(f"{__name__}: could not persist discovery: {e}.")
+    return groups
+
+
+def _name_map(templates):
+    """Map short template names (no folder, no .j2) to template names."""
+    return {x.split("/")[-1].split(".j2")[0]: x for x in templates}
+
+
+def _make_source_loader():
+    """Return loader over template_dirs, built-ins last."""
+    import jinja2
+
+    builtin = jinja2.PackageLoader(
+        package_name="repodoc", package_path="templates")
+    overrides = _lazy("TemplateDirs")[:-1]
+    if not overrides:
+        return builtin
+    return jinja2.ChoiceLoader([jinja2.FileSystemLoader(overrides), builtin])
+
+
+def _make_loader():
+    """Return a loader preferring ahead-of-time compiled templates."""
+    from repodoc import compiled
+
+    if not os.path.isdir(compiled.CompiledDir):
+        return _make_source_loader()
+    return compiled.PrecompiledLoader(_make_source_loader())
+
+
+def make_environment(loader=None, bytecode_cache=None):
+    """Return a new jinja2 Environment for repodoc templates."""
+    import jinja2
+
+    return jinja2.Environment(
+        loader=loader or _make_source_loader(),
+        extensions=[
+            "jinja2_time.TimeExtension",
+        ],
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def _make_environment():
+    from repodoc import cache
+
+    return make_environment(
+        loader=_lazy("Loader"),
+        bytecode_cache=cache.get_bytecode_cache(),
+    )
+
+
+def _make_templates_map():
+    templates_map = {}
+    for m in _lazy("_Maps"):
+        templates_map.update(m)
+    return templates_map
+
+
+_LAZY_ATTRIBUTES = {
+    "Loader": _make_loader,
+    "Environment": _make_environment,
+    "TemplateDirs": template_dirs,
+    "_Discovery": _discover,
+    "Templates": lambda: _lazy("_Discovery")["Templates"],
+    "LicenceTemplates": lambda: _lazy("_Discovery")["LicenceTemplates"],
+    "LicenceMap": lambda: _name_map(_lazy("LicenceTemplates")),
+    "DocTemplates": lambda: _lazy("_Discovery")["DocTemplates"],
+    "DocMap": lambda: _name_map(_lazy("DocTemplates")),
+    "CommunityHealth_Templates": lambda: _lazy("_Discovery")[
+        "CommunityHealth_Templates"],
+    "CommunityHealth_Map": lambda: _name_map(
+        _lazy("CommunityHealth_Templates")),
+    "RootTemplates": lambda: _lazy("_Discovery")["RootTemplates"],
+    "RootMap": lambda: _name_map(_lazy("RootTemplates")),
+    "DotTemplates": lambda: _lazy("_Discovery")["DotTemplates"],
+    "DotMap": lambda: _name_map(_lazy("DotTemplates")),
+    "_Maps": lambda: [
+        _lazy("RootMap"),
+        _lazy("DotMap"),
+        _lazy("DocMap"),
+        _lazy("LicenceMap"),
+        _lazy("CommunityHealth_Map"),
     ],
-)
-Templates = Environment.list_templates()
-LicenceTemplates = [x for x in Templates if x.startswith("licences")]
-LicenceMap = {x.split("/")[-1].split(".j2")[0]: x for x in LicenceTemplates}
-DocTemplates = [x for x in Templates if x.startswith("docs")]
-DocTemplates.append(".readthedocs.yaml.j2")
-DocMap = {x.split("/")[-1].split(".j2")[0]: x for x in DocTemplates}
-CommunityHealth_Templates = [x for x in Templates if x.startswith(".github")]
-CommunityHealth_Map = {
-    x.split("/")[-1].split(".j2")[0]: x for x in CommunityHealth_Templates
+    "TemplatesMap": _make_templates_map,
+    "TemplateNames": lambda: list(_lazy("TemplatesMap").keys()),
 }
-Pypi_Templates = ["MANIFEST.in.j2", "setup.cfg.j2", "setup.py.j2"]
-RootTemplates = [x for x in Templates if "/" not in x]
-RootMap = {x.split("/")[-1].split(".j2")[0]: x for x in RootTemplates}
-DotTemplates = [x for x in RootTemplates if x.startswith(".")]
-DotMap = {x.split("/")[-1].split(".j2")[0]: x for x in DotTemplates}
-_Maps = [
-    RootMap,
-    DotMap,
-    DocMap,
-    LicenceMap,
-    CommunityHealth_Map,
+
+
+# Template groups, named after the subcommands generating them.
+GroupNames = [
+    "licence",
+    "readme",
+    "community_health",
+    "pypi_project",
+    "sphinx_docs",
+    "dot_files",
 ]
-TemplatesMap = {}
-[TemplatesMap.update(m) for m in _Maps]
-TemplateNames = list(TemplatesMap.keys())
+_GROUP_ATTRIBUTES = {
+    "community_health": "CommunityHealth_Templates",
+    "pypi_project": "Pypi_Templates",
+    "sphinx_docs": "DocTemplates",
+    "dot_files": "DotTemplates",
+}
 
 
-def get_variables(template_name, logger=logger):
-    """Return all undeclared variables in template."""
+def _lazy(name):
+    """Build lazy module attribute name once and cache it in the module."""
+    try:
+        return globals()[name]
+    except KeyError:
+        with phase("discovery", name):
+            value = globals()[name] = _LAZY_ATTRIBUTES[name]()
+        return value
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def template_path(template_name):
+    """Return path of template_name, the first match in template_dirs."""
+    parts = template_name.split("/")
+    for top in _lazy("TemplateDirs")[:-1]:
+        path = os.path.join(top, *parts)
+        if os.path.isfile(path):
+            return path
+    return os.path.join(TemplatesDir, *parts)
+
+
+def parse_variables(template_name, logger=logger):
+    """Parse template and return sorted list of its undeclared variables."""
+    import jinja2.meta
+
+    Environment = _lazy("Environment")
     template_source = Environment.loader.get_source(
         Environment, template_name)[0]
     parsed_content_ast = Environment.parse(template_source)
     variables = jinja2.meta.find_undeclared_variables(parsed_content_ast)
+    logger.debug(f"{__name__}.parse_variables({template_name}).")
+    return sorted(variables)
+
+
+def parse_references(template_name, logger=logger):
+    """Parse template and return sorted list of the templates it references.
+
+    Those are pulled in by ``include``, ``extends`` and ``import``. Return
+    None when a reference is computed at render time.
+    """
+    import jinja2.meta
+
+    Environment = _lazy("Environment")
+    template_source = Environment.loader.get_source(
+        Environment, template_name)[0]
+    references = set(jinja2.meta.find_referenced_templates(
+        Environment.parse(template_source)))
+    logger.debug(f"{__name__}.parse_references({template_name}).")
+    if None in references:
+        return None
+    return sorted(references)
+
+
+def get_variables(template_name, logger=logger):
+    """Return all undeclared variables in template."""
+    from repodoc import index
+
+    with phase("get_variables", template_name):
+        variables = index.lookup(template_name, logger=logger)["variables"]
     logger.debug(f"{__name__}.get_variables({template_name}) = {variables}.")
     return list(variables)
 
 
+def group_templates(group, licence=None):
+    """Return list of template names rendered for group."""
+    if group == "licence":
+        if licence not in _lazy("LicenceMap"):
+            raise ValueError(f"Unknown licence {licence!r}.")
+        return [_lazy("LicenceMap")[licence]]
+    if group == "readme":
+        return ["README.md.j2"]
+    if group not in _GROUP_ATTRIBUTES:
+        raise ValueError(f"Unknown template group {group!r}.")
+    return list(_lazy(_GROUP_ATTRIBUTES[group]))
+
+
+def group_outputs(group, licence=None):
+    """Return list of (template_name, output_filename) for group."""
+    if group == "licence":
+        return [(t_name, "LICENCE") for t_name in group_templates(
+            group, licence=licence)]
+    return [(t_name, get_output_filename(t_name))
+            for t_name in group_templates(group)]
+
+
+def plan_groups(context):
+    """Return template groups to generate for the config flags in context.
+
+    ``licence`` is generated when a licence is configured, ``pypi_project``
+    and ``sphinx_docs`` unless the ``pypi`` and ``create_docs`` flags are
+    false.
+    """
+    groups = []
+    if context.get("licence"):
+        groups.append("licence")
+    groups.extend(["readme", "community_health"])
+    if context.get("pypi", True):
+        groups.append("pypi_project")
+    if context.get("create_docs", True):
+        groups.append("sphinx_docs")
+    groups.append("dot_files")
+    return groups
+
+
+def plan_outputs(groups, context):
+    """Return deduplicated (template_name, output_filename) list for groups.
+
+    ``.readthedocs.yaml`` is left out when the ``readthedocs`` flag is false.
+    """
+    templates_map = _lazy("TemplatesMap")
+    outputs = {}
+    for group in groups:
+        for t_name, out_path in group_outputs(
+                group, licence=context.get("licence")):
+            if (t_name == templates_map.get(".readthedocs.yaml")
+                    and not context.get("readthedocs", True)):
+                continue
+            outputs.setdefault(out_path, t_name)
+    return [(t_name, out_path) for out_path, t_name in outputs.items()]
+
+
+def dependency_graph(outputs):
+    """Return {config key: [(template_name, output_filename)]} for outputs.
+
+    Edges come from the undeclared variables of each template, so a key
+    maps to every output whose template references it.
+    """
+    graph = {}
+    for t_name, out_path in outputs:
+        for key in get_variables(t_name):
+            graph.setdefault(key, []).append((t_name, out_path))
+    return graph
+
+
+def changed_keys(old, new):
+    """Return set of config keys whose value differs between old and new."""
+    return {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
+
+
+def affected_outputs(outputs, keys=(), templates=(), previous=None):
+    """Return the outputs that need regenerating, in outputs order.
+
+    Those are outputs depending on one of the changed config keys, outputs
+    of changed templates or of templates including, extending or importing
+    one and, given the previous plan, outputs new to it (a changed licence
+    or pypi flag, say).
+    """
+    from repodoc import index
+
+    graph = dependency_graph(outputs)
+    affected = {output for key in keys for output in graph.get(key, [])}
+    if previous is not None:
+        affected.update(set(outputs) - set(previous))
+    templates = set(templates)
+
+    def template_changed(t_name):
+        if not templates:
+            return False
+        closure = index.dependencies(t_name)
+        return closure is None or not templates.isdisjoint(closure)
+
+    return [
+        (t_name, out_path) for t_name, out_path in outputs
+        if (t_name, out_path) in affected or template_changed(t_name)
+    ]
+
+
 def get_output_filename(template_name, logger=logger):
     """Return Destination output filename for given template_name."""
     output_filename = template_name.split(".j2")[0]
@@ -57,11 +407,65 @@ def get_output_filename(template_name, logger=logger):
     return output_filename
 
 
+def _memoized():
+    """Return True if renderings go through the repodoc.memo render cache.
+
+    ``REPODOC_RENDER_CACHE=0`` renders every template from scratch.
+    """
+    return os.environ.get("REPODOC_RENDER_CACHE", "") != "0"
+
+
 def render_template(template_name, logger=logger, **kwargs):
-    """Render template_name with kwargs."""
-    template = Environment.get_template(template_name)
-    logger.debug(f"{__name__}.render_template({template_name}).")
-    return (get_output_filename(template_name), template.render(**kwargs))
+    """Render template_name with kwargs, through the render cache."""
+    def render():
+        template = _lazy("Environment").get_template(template_name)
+        logger.debug(f"{__name__}.render_template({template_name}).")
+        return template.render(**kwargs)
+
+    with phase("render", template_name):
+        if _memoized():
+            from repodoc import memo
+
+            content = memo.render(template_name, kwargs, render, logger=logger)
+        else:
+            content = render()
+    return get_output_filename(template_name, logger=logger), content
+
+
+def stream_template(template_name, logger=logger, **kwargs):
+    """Render template_name with kwargs chunk by chunk.
+
+    Return (output_filename, iterator of str chunks) produced by
+    ``Template.generate``, or streamed from the render cache, so the
+    rendered document is never held in memory as a whole.
+    """
+    def generate():
+        template = _lazy("Environment").get_template(template_name)
+        logger.debug(f"{__name__}.stream_template({template_name}).")
+        return template.generate(**kwargs)
+
+    # Counted as a call by iter_phase once the chunks are consumed.
+    with phase("render", template_name, calls=0):
+        if _memoized():
+            from repodoc import memo
+
+            chunks = memo.stream(template_name, kwargs, generate,
+                                 logger=logger)
+        else:
+            chunks = generate()
+    if active():
+        chunks = iter_phase("render", template_name, chunks)
+    return get_output_filename(template_name, logger=logger), chunks
+
+
+def render_group(group, logger=logger, **kwargs):
+    """Render all templates of group, return list of (filename, content)."""
+    if group == "licence":
+        return [render_licence(logger=logger, **kwargs)]
+    return [
+        render_template(t_name, logger=logger, **kwargs)
+        for t_name in group_templates(group)
+    ]
 
 
 def render_gitattributes(**kwargs):
@@ -192,7 +596,9 @@ def render_issue_template_config(**kwargs):
 
 def render_licence(licence, **kwargs):
     """Render LICENCE.j2."""
-    template_name = LicenceMap.get(licence)
+    template_name = _lazy("LicenceMap").get(licence)
+    if template_name is None:
+        raise ValueError(f"Unknown licence {licence!r}.")
     return ("LICENCE", render_template(template_name, **kwargs)[-1])
 
 
@@ -0,0 +1,266 @@
+"""Long running render daemon on a local unix socket.
+
+``repodoc serve`` keeps the Jinja2 environment and every compiled template
+warm, and answers one JSON request per connection::
+
+    {"op": "ping"}
+    {"op": "render", "groups": ["readme"], "context": {...}}
+    {"op": "generate", "group": "sphinx_docs", "context": {...},
+     "output": "/abs/path", "licence": null, "jobs": 1, "fsync": "none"}
+    {"op": "generate", "groups": null, "context": {...}, "output": ...}
+
+``render`` returns ``{"ok": true, "files": {path: content}}`` without
+touching disk, ``generate`` writes the group, or with ``groups`` the whole
+render plan, into ``output`` and returns the generate report. Errors are
+returned as ``{"ok": false, "error": ...}``. The CLI uses a running daemon
+through ``request`` automatically.
+
+``request`` adds the client's repodoc version and the values of
+``EnvironmentKeys`` to every payload. A daemon of another version, or one
+whose template search path or caches are configured differently, answers
+``{"ok": false, "mismatch": ...}`` and the client renders locally. A daemon
+serving on a socket other than the default one records it in
+``<default socket>.path`` so that clients find it.
+"""
+import os
+import json
+import signal
+import socket
+import logging
+import socketserver
+import repodoc
+from repodoc.log import buffered_logger, quiet_logger
+from repodoc.session import RepoDocSession
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "EnvironmentKeys",
+    "socket_path",
+    "find_socket",
+    "handle_request",
+    "serve",
+    "request",
+]
+
+
+# Environment variables changing what a render produces, see
+# render.template_dirs and repodoc.memo, that client and daemon must share.
+EnvironmentKeys = [
+    "REPODOC_TEMPLATE_PATH",
+    "REPODOC_ORG_TEMPLATE_PATH",
+    "XDG_CONFIG_HOME",
+    "REPODOC_RENDER_CACHE",
+    "REPODOC_RENDER_CACHE_DIR",
+    "REPODOC_RENDER_CACHE_SIZE",
+    "REPODOC_NO_CACHE",
+    "REPODOC_CACHE_DIR",
+]
+
+
+def socket_path():
+    """Return the default daemon socket path."""
+    if os.environ.get("REPODOC_SOCKET"):
+        return os.environ["REPODOC_SOCKET"]
+    from repodoc import cache
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or cache.cache_dir()
+    return os.path.join(runtime_dir, "repodoc.sock")
+
+
+def _pointer_file():
+    return socket_path() + ".path"
+
+
+def find_socket():
+    """Return socket path of the daemon to use, None if none is running.
+
+    That is the default socket, else the one recorded by ``serve -s``.
+    """
+    path = socket_path()
+    if os.path.exists(path):
+        return path
+    try:
+        with open(_pointer_file()) as rf:
+            path = rf.read().strip()
+    except OSError:
+        return None
+    return path if path and os.path.exists(path) else None
+
+
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = RepoDocSession(logger=quiet_logger())
+    return _session
+
+
+def _render(payload):
+    context = payload.get("context") or {}
+    session = _get_session()
+    files = {}
+    for group in payload["groups"]:
+        files.update(session.render_group(
+            group, context=context, licence=payload.get("licence")))
+    return {"ok": True, "files": files}
+
+
+def _generate(payload):
+    session = RepoDocSession(
+        jobs=payload.get("jobs", 1),
+        fsync=payload.get("fsync", "none"),
+        engine=payload.get("engine", "threads"),
+        logger=buffered_logger()[0],
+    )
+    if "groups" in payload:
+        report = session.generate_plan(
+            payload["groups"],
+            context=payload.get("context") or {},
+            base_path=payload["output"],
+        )
+    else:
+        report = session.generate_group(
+            payload["group"],
+            context=payload.get("context") or {},
+            licence=payload.get("licence"),
+            base_path=payload["output"],
+        )
+    return {"ok": True, "report": report}
+
+
+_OPS = {
+    "ping": lambda payload: {"ok": True, "version": repodoc.__version__},
+    "render": _render,
+    "generate": _generate,
+}
+
+
+def _mismatch(payload):
+    """Return why this daemon cannot serve payload, None if it can."""
+    version = payload.get("version")
+    if version is not None and version != repodoc.__version__:
+        return (f"daemon runs repodoc {repodoc.__version__}, client"
+                f" {version}")
+    env = payload.get("env")
+    if env is None:
+        return None
+    differing = [k for k in EnvironmentKeys if env.get(k) != os.environ.get(k)]
+    if differing:
+        return f"daemon environment differs in {', '.join(differing)}"
+    return None
+
+
+def handle_request(payload, logger=logger):
+    """Return response dict for a decoded request payload."""
+    mismatch = _mismatch(payload)
+    if mismatch is not None and payload.get("op") != "ping":
+        logger.debug(f"Refused {payload.get('op')} request: {mismatch}.")
+        return {"ok": False, "error": mismatch, "mismatch": mismatch}
+    try:
+        response = _OPS[payload["op"]](payload)
+    except Exception as e:
+        logger.error(f"{payload.get('op')} request failed: {e!r}.")
+        return {"ok": False, "error": repr(e)}
+    logger.debug(f"Served {payload['op']} request.")
+    return response
+
+
+def _make_handler(logger):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                payload = json.loads(self.rfile.readline())
+            except ValueError as e:
+                response = {"ok": False, "error": f"bad request: {e}"}
+            else:
+                response = handle_request(payload, logger=logger)
+            self.wfile.write(json.dumps(response, default=str).encode())
+
+    return Handler
+
+
+def serve(path, logger=logger):
+    """Warm up the environment and serve requests on unix socket path."""
+    _get_session().warm_up()
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    server = socketserver.ThreadingUnixStreamServer(
+        path, _make_handler(logger))
+    server.daemon_threads = True
+    os.chmod(path, 0o600)
+    pointer = None
+    if os.path.abspath(path) != os.path.abspath(socket_path()):
+        pointer = _pointer_file()
+        try:
+            os.makedirs(os.path.dirname(pointer), exist_ok=True)
+            with open(pointer, "w") as wf:
+                wf.write(os.path.abspath(path))
+        except OSError as e:
+            logger.warning(f"Clients will need REPODOC_SOCKET={path}: {e}.")
+            pointer = None
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"repodoc {repodoc.__version__} serving on {path}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(f"Stopped serving on {path}.")
+    finally:
+        server.server_close()
+        os.remove(path)
+        if pointer is not None:
+            _remove_pointer(pointer, os.path.abspath(path))
+
+
+def _remove_pointer(pointer, path):
+    """Remove pointer unless another daemon has replaced it since."""
+    try:
+        with open(pointer) as rf:
+            if rf.read().strip() == path:
+                os.remove(pointer)
+    except OSError:
+        pass
+
+
+def request(payload, path=None, timeout=60, logger=logger):
+    """Send payload to a running daemon, return its response or None.
+
+    None means the caller should render locally: no daemon is listening,
+    it cannot be reached or it refused the request as mismatched.
+    """
+    path = path or find_socket()
+    if not hasattr(socket, "AF_UNIX") or not path or not os.path.exists(path):
+        return None
+    payload = dict(
+        payload,
+        version=repodoc.__version__,
+        env={k: os.environ[k] for k in EnvironmentKeys if k in os.environ},
+    )
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(payload, default=str).encode() + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            data = b"".join(iter(lambda: sock.recv(1 << 16), b""))
+        response = json.loads(data)
+    except (ConnectionRefusedError, FileNotFoundError):
+        logger.debug(f"No repodoc daemon listening on {path}.")
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"repodoc daemon on {path} failed ({e!r}),"
+                       " rendering locally.")
+        return None
+    if response.get("mismatch"):
+        logger.warning(f"Not using repodoc daemon on {path}:"
+                       f" {response['mismatch']}.")
+        return None
+    logger.debug(f"Used repodoc daemon on {path}.")
+    return response
@@ -0,0 +1,375 @@
+"""Embeddable render session.
+
+A ``RepoDocSession`` loads the environment, compiled templates and config
+once and can then render any number of template groups, either in memory
+or onto disk::
+
+    session = RepoDocSession(config_file="repodoc_config.yml")
+    files = session.render_group("sphinx_docs")   # {path: content}
+    session.write(files, base_path="/tmp/scaffold")
+
+The CLI subcommands are thin wrappers around a session.
+"""
+import os
+import logging
+import concurrent.futures
+from repodoc import lock
+from repodoc import render
+from repodoc import writer
+from repodoc import settings
+from repodoc.log import buffered_logger, replay_records
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "RepoDocSession",
+    "Engines",
+]
+
+# The async engine lives in repodoc.aio, imported on use as asyncio is slow
+# to import.
+Engines = ["threads", "async"]
+
+
+def _buffered_task(task, *args, **kwargs):
+    """Run task collecting its log records."""
+    task_logger, records = buffered_logger()
+    return task(*args, logger=task_logger, **kwargs), records
+
+
+def _run_tasks(task, outputs, jobs, logger=logger, **kwargs):
+    """Call task(t_name, out_path, **kwargs) for outputs, return results.
+
+    With jobs greater than one the tasks run on a thread pool and their log
+    records are replayed in outputs order.
+    """
+    entries = kwargs.pop("entries", None)
+
+    def task_kwargs(out_path):
+        if entries is None:
+            return kwargs
+        return dict(kwargs, entry=entries.get(out_path))
+
+    if jobs <= 1 or len(outputs) <= 1:
+        return [
+            task(t_name, out_path, logger=logger, **task_kwargs(out_path))
+            for t_name, out_path in outputs
+        ]
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                _buffered_task, task, t_name, out_path,
+                **task_kwargs(out_path),
+            )
+            for t_name, out_path in outputs
+        ]
+        for future in futures:
+            result, records = future.result()
+            replay_records(records, logger)
+            results.append(result)
+    return results
+
+
+def _generate_one(t_name, out_path, kwargs=None, txn=None, entry=None,
+                  incremental=False, record=False, logger=logger):
+    """Generate out_path from t_name into txn, return (status, lock entry).
+
+    The lock entry is None unless incremental or record.
+    """
+    if not incremental:
+        chunks = render.stream_template(t_name, logger=logger, **kwargs)[-1]
+        out_hash = txn.write(out_path, chunks, logger=logger)
+        if not record:
+            return (lock.WRITTEN, None)
+        t_hash, ctx_hash = lock.input_hashes(t_name, kwargs, logger=logger)
+        return (lock.WRITTEN,
+                lock.make_entry(t_name, t_hash, ctx_hash, out_hash))
+    full_path = os.path.join(txn.base_path, out_path)
+    status, t_hash, ctx_hash, disk = lock.plan_output(
+        t_name, kwargs, entry, full_path, logger=logger)
+    if status == lock.SKIPPED:
+        logger.debug(f"Skipped {out_path}, inputs unchanged.")
+        return (status, entry)
+    if status == lock.CONFLICT:
+        logger.warning(f"Conflict {out_path} was modified, not overwritten.")
+        return (status, entry)
+    chunks = render.stream_template(t_name, logger=logger, **kwargs)[-1]
+    out_hash = txn.write(out_path, chunks, logger=logger)
+    if disk is not None and disk[0] == out_hash:
+        txn.discard(out_path, logger=logger)
+        logger.debug(f"Skipped {out_path}, output unchanged.")
+        status = lock.SKIPPED
+    else:
+        status = lock.WRITTEN
+    return (status, lock.make_entry(t_name, t_hash, ctx_hash, out_hash))
+
+
+def _check_one(t_name, out_path, kwargs=None, base_path=None, diff=False,
+               logger=logger):
+    """Render t_name and compare it with out_path, return (status, diff)."""
+    chunks = render.stream_template(t_name, logger=logger, **kwargs)[-1]
+    full_path = os.path.join(base_path, out_path)
+    if writer.content_matches(full_path, chunks):
+        logger.debug(f"Unchanged {out_path}.")
+        return (lock.SKIPPED, "")
+    if not diff:
+        return (lock.WRITTEN, "")
+    content = render.render_template(t_name, logger=logger, **kwargs)[-1]
+    return (lock.WRITTEN, writer.unified_diff(out_path, content, full_path))
+
+
+class RepoDocSession:
+    """Render template groups repeatedly with one environment and config.
+
+    :param config_file: optional config file providing the base context
+    :param context: optional dict updating the base context
+    :param base_path: default destination directory for writes
+    :param jobs: number of threads rendering and writing a group, or of
+        concurrent filesystem operations with the async engine
+    :param fsync: one of ``writer.FsyncModes``
+    :param engine: one of ``Engines``, ``"async"`` pipelines renders
+        and writes with asyncio for high latency filesystems
+    :param use_daemon: delegate generate_group to a running repodoc daemon
+    """
+
+    def __init__(
+        self,
+        config_file=None,
+        context=None,
+        base_path=None,
+        jobs=1,
+        fsync="none",
+        use_daemon=False,
+        engine="threads",
+        logger=logger,
+    ):
+        if engine not in Engines:
+            raise ValueError(f"engine must be one of {Engines}.")
+        self.logger = logger
+        self.base_path = base_path or os.path.abspath(os.path.curdir)
+        self.jobs = jobs or 1
+        self.fsync = fsync
+        self.use_daemon = use_daemon
+        self.engine = engine
+        self.context = {}
+        if config_file is not None:
+            self.context.update(self.load_config(config_file))
+        self.context.update(context or {})
+
+    @property
+    def environment(self):
+        """Return the shared jinja2 Environment, built on first use.
+
+        Sessions delegating to a daemon never import jinja2.
+        """
+        return render.Environment
+
+    def load_config(self, config_file):
+        """Return dict read from config_file, parsed once while unchanged."""
+        return settings.load(config_file, logger=self.logger)
+
+    def warm_up(self):
+        """Compile every template now instead of on first use."""
+        for t_name in render.Templates:
+            self.environment.get_template(t_name)
+
+    def context_for(self, context=None):
+        """Return the session context updated with context."""
+        merged = dict(self.context)
+        merged.update(context or {})
+        return merged
+
+    def outputs(self, group, context=None, licence=None):
+        """Return list of (template_name, output_filename) for group."""
+        licence = licence or self.context_for(context).get("licence")
+        return render.group_outputs(group, licence=licence)
+
+    def render_group(self, group, context=None, licence=None):
+        """Render group in memory, return {output path: content}."""
+        context = self.context_for(context)
+        return {
+            out_path: render.render_template(
+                t_name, logger=self.logger, **context)[-1]
+            for t_name, out_path in self.outputs(group, context, licence)
+        }
+
+    def render_groups(self, groups, context=None):
+        """Render several groups in memory, return {output path: content}."""
+        files = {}
+        for group in groups:
+            files.update(self.render_group(group, context=context))
+        return files
+
+    def _sink(self, sink, base_path=None, fsync=None):
+        """Return sink, or a directory sink writing under base_path."""
+        if sink is not None:
+            return sink
+        return writer.Transaction(
+            base_path=base_path or self.base_path,
+            fsync=fsync or self.fsync,
+            logger=self.logger,
+        )
+
+    def write(self, files, base_path=None, fsync=None, sink=None):
+        """Write {output path: content} atomically, return written paths.
+
+        sink, see repodoc.sinks, replaces the directory under base_path.
+        """
+        with self._sink(sink, base_path, fsync) as txn:
+            for out_path, content in files.items():
+                txn.write(out_path, content)
+        return list(files)
+
+    def plan(self, groups=None, context=None):
+        """Return deduplicated (template_name, output_filename) render plan.
+
+        groups default to render.plan_groups for the context's config flags.
+        """
+        context = self.context_for(context)
+        return render.plan_outputs(
+            groups or render.plan_groups(context), context)
+
+    def check_outputs(self, outputs, context=None, base_path=None,
+                      diff=False):
+        """Compare rendered outputs with the files on disk, writing nothing.
+
+        Return (report, diffs): report is {status: [output paths]} where
+        ``lock.WRITTEN`` lists outputs that would change, diffs maps those
+        paths to unified diffs when diff is true.
+        """
+        context = self.context_for(context)
+        results = _run_tasks(
+            _check_one, outputs, self.jobs, logger=self.logger,
+            kwargs=context, base_path=base_path or self.base_path,
+            diff=diff,
+        )
+        report = {lock.WRITTEN: [], lock.SKIPPED: []}
+        diffs = {}
+        for (t_name, out_path), (status, diff_text) in zip(outputs, results):
+            report[status].append(out_path)
+            if status == lock.WRITTEN and diff:
+                diffs[out_path] = diff_text
+        return report, diffs
+
+    def check_group(self, group, context=None, licence=None, base_path=None,
+                    diff=False):
+        """Compare rendered group with the files on disk, see check_outputs."""
+        return self.check_outputs(
+            self.outputs(group, context, licence), context=context,
+            base_path=base_path, diff=diff,
+        )
+
+    def _generate_with_daemon(self, payload):
+        """Ask a running repodoc daemon to generate, None if absent."""
+        from repodoc import server
+
+        payload = dict(payload, op="generate", jobs=self.jobs,
+                       fsync=self.fsync, engine=self.engine)
+        response = server.request(payload, logger=self.logger)
+        if response is None:
+            return None
+        if not response["ok"]:
+            raise RuntimeError(f"repodoc daemon: {response['error']}")
+        for out_path in response["report"][lock.WRITTEN]:
+            self.logger.info(f"Written {out_path}.")
+        return response["report"]
+
+    def generate_outputs(self, outputs, context=None, base_path=None,
+                         incremental=False, sink=None):
+        """Render and write outputs, a list of (template, output path).
+
+        Templates are streamed into one writer.Transaction, on ``jobs``
+        threads when more than one, with log records replayed in template
+        order; the async engine runs them through the aio pipeline instead.
+        With incremental outputs recorded in ``.repodoc.lock`` are only
+        regenerated when their template or context changed; without, the
+        entries of the written outputs are refreshed when base_path holds a
+        lock file. sink, see repodoc.sinks, receives the outputs instead of
+        the base_path directory.
+
+        Return dict of {status: [output paths]}.
+        """
+        if incremental and sink is not None:
+            raise ValueError("Incremental generation needs a directory.")
+        context = self.context_for(context)
+        base_path = base_path or self.base_path
+        record = incremental or (sink is None and os.path.isfile(
+            os.path.join(base_path, lock.LockFile)))
+        lock_files = lock.load_lock(base_path) if record else {}
+        with self._sink(sink, base_path) as txn:
+            if self.engine == "async":
+                from repodoc import aio
+
+                results = aio.generate_outputs(
+                    outputs, context, txn, entries=lock_files,
+                    incremental=incremental, record=record,
+                    limit=self.jobs if self.jobs > 1 else aio.DefaultLimit,
+                    logger=self.logger,
+                )
+            else:
+                results = _run_tasks(
+                    _generate_one, outputs, self.jobs, logger=self.logger,
+                    kwargs=context, txn=txn, entries=lock_files,
+                    incremental=incremental, record=record,
+                )
+        report = {lock.WRITTEN: [], lock.SKIPPED: [], lock.CONFLICT: []}
+        for (t_name, out_path), (status, entry) in zip(outputs, results):
+            report[status].append(out_path)
+            if entry is not None and status != lock.CONFLICT:
+                lock_files[out_path] = lock.stamp_entry(
+                    entry, os.path.join(base_path, out_path))
+        if record:
+            lock.save_lock(lock_files, base_path=base_path)
+        if incremental:
+            self.logger.info(
+                f"{len(report[lock.WRITTEN])} written,"
+                f" {len(report[lock.SKIPPED])} skipped,"
+                f" {len(report[lock.CONFLICT])} conflicting."
+            )
+        return report
+
+    def generate_group(self, group, context=None, licence=None,
+                       base_path=None, incremental=False, sink=None):
+        """Render and write every template of group, see generate_outputs.
+
+        Plain generation into a directory is delegated to a running daemon
+        with use_daemon.
+        """
+        context = self.context_for(context)
+        base_path = base_path or self.base_path
+        if not incremental and sink is None and self.use_daemon:
+            report = self._generate_with_daemon({
+                "group": group,
+                "licence": licence,
+                "context": context,
+                "output": base_path,
+            })
+            if report is not None:
+                return report
+        return self.generate_outputs(
+            self.outputs(group, context, licence), context=context,
+            base_path=base_path, incremental=incremental, sink=sink,
+        )
+
+    def generate_plan(self, groups=None, context=None, base_path=None,
+                      incremental=False, sink=None):
+        """Render and write the whole plan of groups in one transaction.
+
+        Plain generation into a directory is delegated to a running daemon
+        with use_daemon.
+        """
+        context = self.context_for(context)
+        base_path = base_path or self.base_path
+        if not incremental and sink is None and self.use_daemon:
+            report = self._generate_with_daemon({
+                "groups": groups,
+                "context": context,
+                "output": base_path,
+            })
+            if report is not None:
+                return report
+        return self.generate_outputs(
+            self.plan(groups, context), context=context,
+            base_path=base_path, incremental=incremental, sink=sink,
+        )
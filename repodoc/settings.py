@@ -0,0 +1,134 @@
+"""Cached loading of repodoc configuration files.
+
+``load`` memoizes parsed configs keyed by absolute path, mtime and size, so
+batch and daemon callers parse each distinct config file once. With
+``REPODOC_CONFIG_CACHE=json`` (or ``json_cache=True``) the parsed data is
+also stored next to the YAML file as ``.<name>.json`` and reused by later
+processes while the YAML file is unchanged. A warning is logged once when
+PyYAML lacks its libyaml based C loader, which is about 10x faster.
+"""
+import os
+import copy
+import json
+import yaml
+import logging
+
+from repodoc.profiling import phase
+
+try:
+    from yaml import CLoader as Loader, CDumper as Dumper
+
+    CLoaderAvailable = True
+except ImportError:
+    from yaml import Loader, Dumper
+
+    CLoaderAvailable = False
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "Loader",
+    "Dumper",
+    "CLoaderAvailable",
+    "stats",
+    "json_cache_path",
+    "load",
+    "dump",
+    "clear",
+]
+
+stats = {"parsed": 0, "memo_hits": 0, "json_hits": 0}
+_memo = {}
+_warned = []
+
+
+def _warn_slow_loader(logger=logger):
+    if not CLoaderAvailable and not _warned:
+        _warned.append(True)
+        logger.warning(
+            "PyYAML was built without libyaml, config files are parsed with"
+            " the slow pure Python loader."
+        )
+
+
+def _json_cache_enabled(json_cache):
+    if json_cache is not None:
+        return json_cache
+    return os.environ.get("REPODOC_CONFIG_CACHE", "") == "json"
+
+
+def json_cache_path(path):
+    """Return path of the JSON cache kept next to config file path."""
+    dirname, basename = os.path.split(os.path.abspath(path))
+    return os.path.join(dirname, f".{basename}.json")
+
+
+def _read_json_cache(path, key):
+    try:
+        with open(json_cache_path(path)) as rf:
+            cached = json.load(rf)
+    except (OSError, ValueError):
+        return None
+    if [cached.get("mtime_ns"), cached.get("size")] != list(key):
+        return None
+    return cached.get("data")
+
+
+def _write_json_cache(path, key, data, logger=logger):
+    filename = json_cache_path(path)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_filename, "w") as wf:
+            json.dump({"mtime_ns": key[0], "size": key[1], "data": data}, wf)
+        os.replace(tmp_filename, filename)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug(f"{__name__}: not caching {path} as json: {e}.")
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def load(path, json_cache=None, logger=logger):
+    """Return dict of configuration parameters read from path."""
+    path = os.path.abspath(path)
+    with phase("config_load", path):
+        return _load(path, json_cache, logger=logger)
+
+
+def _load(path, json_cache=None, logger=logger):
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    memo = _memo.get(path)
+    if memo is not None and memo[0] == key:
+        stats["memo_hits"] += 1
+        return copy.deepcopy(memo[1])
+    use_json = _json_cache_enabled(json_cache)
+    data = _read_json_cache(path, key) if use_json else None
+    if data is not None:
+        stats["json_hits"] += 1
+    else:
+        _warn_slow_loader(logger=logger)
+        with open(path, "r") as cf:
+            data = yaml.load(cf, Loader=Loader) or {}
+        stats["parsed"] += 1
+        logger.debug(f"{__name__}: parsed {path}.")
+        if use_json:
+            _write_json_cache(path, key, data, logger=logger)
+    _memo[path] = (key, data)
+    return copy.deepcopy(data)
+
+
+def dump(path, data, json_cache=None, logger=logger):
+    """Write data to config file path and refresh the caches."""
+    with open(path, "w") as wf:
+        yaml.dump(data, wf, Dumper=Dumper)
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    _memo[path] = (key, copy.deepcopy(data))
+    if _json_cache_enabled(json_cache):
+        _write_json_cache(path, key, data, logger=logger)
+
+
+def clear():
+    """Forget all memoized configs."""
+    _memo.clear()
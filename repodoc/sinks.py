@@ -0,0 +1,409 @@
+"""Output sinks receiving rendered templates.
+
+A sink has the ``writer.Transaction`` interface: ``write(out_path,
+content)`` stages a str or an iterable of str chunks and returns the sha256
+of its bytes, ``discard``, ``commit`` and ``rollback``, and it commits on a
+clean exit from a ``with`` block. Available sinks:
+
+* ``DirectorySink``: the atomic directory writer, ``writer.Transaction``.
+* ``MemorySink``: keeps ``{out_path: bytes}`` in ``files``.
+* ``ArchiveSink``: streams a tar (optionally gz, bz2 or xz compressed) or
+  zip archive to a file or to stdout in one pass on commit.
+* ``GitSink``: commits the outputs to a branch as a ``git fast-import``
+  stream, written to a file or stdout or piped into a repository, without
+  touching any working tree.
+
+Archive and git sinks stage outputs in temporary files, not in memory, and
+copy them into the archive or stream in output path order on commit.
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import itertools
+import tarfile
+import zipfile
+import tempfile
+import threading
+import subprocess
+from repodoc import writer
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "DirectorySink",
+    "MemorySink",
+    "ArchiveSink",
+    "GitSink",
+    "ArchiveFormats",
+    "archive_format",
+    "checked_out_branches",
+    "branch_ref",
+]
+
+DirectorySink = writer.Transaction
+
+# Longest suffix first so ".tar.gz" wins over ".gz".
+ArchiveFormats = {
+    ".tar.gz": "w|gz",
+    ".tgz": "w|gz",
+    ".tar.bz2": "w|bz2",
+    ".tar.xz": "w|xz",
+    ".tar": "w|",
+    ".zip": "zip",
+}
+
+
+class MemorySink:
+    """Keep rendered outputs in memory as ``{out_path: bytes}``.
+
+    ``files`` is filled on commit, in output path order.
+    """
+
+    base_path = None
+
+    def __init__(self, logger=logger):
+        self.logger = logger
+        self.files = {}
+        self._staged = {}
+        self._lock = threading.Lock()
+        self._committed = False
+
+    def write(self, out_path, content, logger=None):
+        """Stage content (str or iterable of str chunks) for out_path.
+
+        Return sha256 hexdigest of the staged bytes.
+        """
+        logger = logger or self.logger
+        if isinstance(content, str):
+            content = [content]
+        buf = io.BytesIO()
+        digest = writer.write_chunks(buf, content)
+        with self._lock:
+            self._staged[out_path] = buf.getvalue()
+        logger.debug(f"Staged {out_path}.")
+        return digest
+
+    def discard(self, out_path, logger=None):
+        """Drop the staged content for out_path."""
+        with self._lock:
+            del self._staged[out_path]
+        (logger or self.logger).debug(f"Discarded {out_path}.")
+
+    def _take(self):
+        """Return staged (out_path, bytes) pairs sorted and clear them.
+
+        Return None when nothing was staged since the last commit, so that
+        committing twice, as the aio engine and the ``with`` block around it
+        do, publishes once.
+        """
+        with self._lock:
+            staged = sorted(self._staged.items())
+            self._staged.clear()
+            if not staged and self._committed:
+                return None
+            self._committed = True
+        return staged
+
+    def commit(self, logger=None, pool=None):
+        """Publish staged outputs to files, return list of out paths."""
+        staged = self._take() or []
+        self.files.update(staged)
+        return [out_path for out_path, _ in staged]
+
+    def rollback(self):
+        """Discard staged outputs."""
+        with self._lock:
+            self._staged.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class _FileStagedSink(MemorySink):
+    """MemorySink staging outputs in a temporary directory.
+
+    ``_take`` returns (out_path, staged file) pairs, the staged files are
+    removed by ``rollback``.
+    """
+
+    def __init__(self, logger=logger):
+        super().__init__(logger=logger)
+        self.staging = None
+        self._counter = itertools.count()
+
+    def _staging_dir(self):
+        with self._lock:
+            if self.staging is None:
+                self.staging = tempfile.mkdtemp(prefix="repodoc-sink-")
+        return self.staging
+
+    def write(self, out_path, content, logger=None):
+        """Stage content (str or iterable of str chunks) for out_path.
+
+        Return sha256 hexdigest of the staged bytes.
+        """
+        logger = logger or self.logger
+        if isinstance(content, str):
+            content = [content]
+        staged = os.path.join(self._staging_dir(), str(next(self._counter)))
+        with open(staged, "wb", buffering=writer.WriteBufferSize) as wf:
+            digest = writer.write_chunks(wf, content)
+        with self._lock:
+            self._staged[out_path] = staged
+        logger.debug(f"Staged {out_path}.")
+        return digest
+
+    def discard(self, out_path, logger=None):
+        """Drop the staged file for out_path."""
+        with self._lock:
+            staged = self._staged.pop(out_path)
+        os.remove(staged)
+        (logger or self.logger).debug(f"Discarded {out_path}.")
+
+    def rollback(self):
+        """Discard staged files and the staging directory."""
+        with self._lock:
+            self._staged.clear()
+            staging, self.staging = self.staging, None
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def archive_format(target):
+    """Return tarfile stream mode or "zip" for the target file name."""
+    name = target.lower()
+    for suffix, mode in ArchiveFormats.items():
+        if name.endswith(suffix):
+            return mode
+    raise ValueError(
+        f"Unknown archive type for {target!r}, expected one of"
+        f" {', '.join(ArchiveFormats)}."
+    )
+
+
+class ArchiveSink(_FileStagedSink):
+    """Write rendered outputs as one tar or zip archive.
+
+    Outputs are staged in temporary files and the archive is streamed in
+    output path order on commit, so its content does not depend on
+    ``--jobs``. target is a file name, replaced atomically, or ``"-"`` for
+    stdout, in which case fmt (a key of ``ArchiveFormats``) defaults to
+    ``".tar"``. Member mtimes honour ``SOURCE_DATE_EPOCH`` for reproducible
+    archives.
+    """
+
+    def __init__(self, target, fmt=None, logger=logger):
+        super().__init__(logger=logger)
+        self.target = target
+        if fmt is not None:
+            self.mode = archive_format(fmt)
+        elif target == "-":
+            self.mode = ArchiveFormats[".tar"]
+        else:
+            self.mode = archive_format(target)
+
+    def _write_archive(self, fileobj, staged):
+        mtime = int(os.environ.get("SOURCE_DATE_EPOCH", time.time()))
+        if self.mode == "zip":
+            with zipfile.ZipFile(
+                fileobj, "w", compression=zipfile.ZIP_DEFLATED
+            ) as zf:
+                for out_path, path in staged:
+                    info = zipfile.ZipInfo(
+                        out_path, time.localtime(mtime)[:6])
+                    info.external_attr = 0o644 << 16
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with open(path, "rb") as rf, zf.open(info, "w") as mf:
+                        shutil.copyfileobj(rf, mf, writer.WriteBufferSize)
+            return
+        with tarfile.open(fileobj=fileobj, mode=self.mode) as tf:
+            for out_path, path in staged:
+                info = tarfile.TarInfo(out_path)
+                info.size = os.path.getsize(path)
+                info.mtime = mtime
+                info.mode = 0o644
+                with open(path, "rb") as rf:
+                    tf.addfile(info, rf)
+
+    def _publish(self, staged):
+        if self.target == "-":
+            stdout = sys.__stdout__.buffer
+            self._write_archive(stdout, staged)
+            stdout.flush()
+            return
+        target = os.path.abspath(self.target)
+        fd, tmp = tempfile.mkstemp(
+            prefix=".repodoc-archive-", dir=os.path.dirname(target))
+        umask = os.umask(0)
+        os.umask(umask)
+        try:
+            os.chmod(tmp, 0o666 & ~umask)
+            with os.fdopen(fd, "wb", buffering=writer.WriteBufferSize) as wf:
+                self._write_archive(wf, staged)
+            os.replace(tmp, target)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def commit(self, logger=None, pool=None):
+        """Stream the archive to target, return list of out paths."""
+        logger = logger or self.logger
+        staged = self._take()
+        if staged is None:
+            return []
+        try:
+            self._publish(staged)
+        finally:
+            self.rollback()
+        for out_path, _ in staged:
+            logger.debug(f"Archived {out_path}.")
+        target = "stdout" if self.target == "-" else self.target
+        logger.info(f"Written {len(staged)} files to {target}.")
+        return [out_path for out_path, _ in staged]
+
+
+def branch_ref(branch):
+    """Return the full ref of branch, e.g. ``refs/heads/main``."""
+    return branch if branch.startswith("refs/") else f"refs/heads/{branch}"
+
+
+def checked_out_branches(repo):
+    """Return set of refs checked out in any worktree of repo."""
+    proc = subprocess.run(
+        ["git", "-C", repo, "worktree", "list", "--porcelain"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    return {
+        line.split(" ", 1)[1]
+        for line in proc.stdout.decode("utf-8").splitlines()
+        if line.startswith("branch ")
+    }
+
+
+class GitSink(_FileStagedSink):
+    """Commit rendered outputs to a git branch with ``git fast-import``.
+
+    With repo, the stream is piped into ``git fast-import`` run in that
+    repository, on top of branch if it exists; its working tree and index
+    are left alone. Otherwise the stream is written to target, a file name
+    or ``"-"`` for stdout, as a root commit for ``git fast-import`` to
+    load later. The committer comes from ``git var GIT_COMMITTER_IDENT`` in
+    repo, else from ``GIT_COMMITTER_NAME``/``GIT_COMMITTER_EMAIL``.
+
+    A branch checked out in a worktree of repo is refused: moving it would
+    leave that worktree and its index out of date.
+    """
+
+    def __init__(self, repo=None, target=None, branch="main",
+                 message="Generate repository scaffold with repodoc.",
+                 logger=logger):
+        super().__init__(logger=logger)
+        if (repo is None) == (target is None):
+            raise ValueError("GitSink needs exactly one of repo or target.")
+        self.repo = repo
+        self.target = target
+        self.ref = branch_ref(branch)
+        self.message = message
+
+    def _git(self, *args):
+        return subprocess.run(
+            ["git", "-C", self.repo] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+
+    def _ident(self):
+        if self.repo is not None:
+            proc = self._git("var", "GIT_COMMITTER_IDENT")
+            if proc.returncode == 0:
+                return proc.stdout.decode("utf-8").strip()
+        name = os.environ.get("GIT_COMMITTER_NAME", "repodoc")
+        email = os.environ.get("GIT_COMMITTER_EMAIL", "repodoc@localhost")
+        when = int(os.environ.get("SOURCE_DATE_EPOCH", time.time()))
+        return f"{name} <{email}> {when} +0000"
+
+    def _parent(self):
+        if self.repo is None:
+            return None
+        proc = self._git("rev-parse", "--verify", "-q", f"{self.ref}^0")
+        if proc.returncode != 0:
+            return None
+        return proc.stdout.decode("ascii").strip()
+
+    def _write_stream(self, wf, staged):
+        for mark, (_, path) in enumerate(staged, 1):
+            size = os.path.getsize(path)
+            wf.write(b"blob\nmark :%d\ndata %d\n" % (mark, size))
+            with open(path, "rb") as rf:
+                shutil.copyfileobj(rf, wf, writer.WriteBufferSize)
+            wf.write(b"\n")
+        message = self.message.encode("utf-8")
+        wf.write(f"commit {self.ref}\n".encode("utf-8"))
+        wf.write(f"committer {self._ident()}\n".encode("utf-8"))
+        wf.write(b"data %d\n%s\n" % (len(message), message))
+        parent = self._parent()
+        if parent:
+            wf.write(f"from {parent}\n".encode("ascii"))
+        for mark, (out_path, _) in enumerate(staged, 1):
+            wf.write(f"M 100644 :{mark} {out_path}\n".encode("utf-8"))
+        wf.write(b"\n")
+
+    def commit(self, logger=None, pool=None):
+        """Emit the fast-import stream, return list of out paths."""
+        logger = logger or self.logger
+        staged = self._take()
+        if staged is None:
+            return []
+        try:
+            self._publish(staged, logger)
+        finally:
+            self.rollback()
+        return [out_path for out_path, _ in staged]
+
+    def _publish(self, staged, logger):
+        if self.repo is not None:
+            if self.ref in checked_out_branches(self.repo):
+                raise RuntimeError(
+                    f"Refusing to update {self.ref}, checked out in"
+                    f" {self.repo}; choose another branch."
+                )
+            proc = subprocess.Popen(
+                ["git", "-C", self.repo, "fast-import", "--quiet"],
+                stdin=subprocess.PIPE,
+            )
+            try:
+                with proc.stdin as wf:
+                    self._write_stream(wf, staged)
+            except BrokenPipeError:
+                pass
+            if proc.wait() != 0:
+                raise RuntimeError(
+                    f"git fast-import failed in {self.repo} with exit"
+                    f" status {proc.returncode}."
+                )
+            logger.info(
+                f"Committed {len(staged)} files to {self.ref} in"
+                f" {self.repo}."
+            )
+        elif self.target == "-":
+            stdout = sys.__stdout__.buffer
+            self._write_stream(stdout, staged)
+            stdout.flush()
+            logger.info(f"Written fast-import stream of {len(staged)} files.")
+        else:
+            with open(self.target, "wb",
+                      buffering=writer.WriteBufferSize) as wf:
+                self._write_stream(wf, staged)
+            logger.info(
+                f"Written fast-import stream of {len(staged)} files to"
+                f" {self.target}."
+            )
@@ -0,0 +1,249 @@
+"""Watch the config file and templates and regenerate affected outputs.
+
+Changes are picked up with inotify (through ctypes, Linux only) or by
+polling modification times. Bursts of events are debounced, then only the
+outputs whose template changed, or whose template references a config key
+whose value changed (``render.affected_outputs``), are regenerated with the
+session's warm environment.
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+from repodoc import index
+from repodoc import render
+from repodoc import settings
+
+logger = logging.getLogger("repodoc")
+
+__all__ = [
+    "InotifyWatcher",
+    "PollingWatcher",
+    "make_watcher",
+    "watch",
+]
+
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM
+            | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+_IN_ISDIR = 0x40000000
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Report changed files under dirs, and files, using inotify.
+
+    Files are watched through their directory so that editors replacing a
+    file by rename are noticed. Subdirectories created later are watched
+    as they appear.
+    """
+
+    def __init__(self, files=(), dirs=()):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs = {}
+        self.files = {os.path.abspath(f) for f in files}
+        for path in self.files:
+            self._add(os.path.dirname(path))
+        for top in dirs:
+            for dirpath, _, _ in os.walk(top):
+                self._add(dirpath, recursive=True)
+
+    def _add(self, path, recursive=False):
+        import ctypes
+
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(path), _IN_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._dirs[wd] = (os.path.abspath(path), recursive)
+
+    def changes(self, timeout=None):
+        """Return set of changed paths, empty after timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if wd not in self._dirs:
+                continue
+            dirpath, recursive = self._dirs[wd]
+            path = os.path.join(dirpath, os.fsdecode(name))
+            if recursive:
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._add(path, recursive=True)
+                if not mask & _IN_ISDIR:
+                    changed.add(path)
+            elif path in self.files:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Report changed files under dirs, and files, by polling mtimes."""
+
+    def __init__(self, files=(), dirs=(), interval=0.5):
+        self.files = [os.path.abspath(f) for f in files]
+        self.dirs = [os.path.abspath(d) for d in dirs]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        paths = list(self.files)
+        for top in self.dirs:
+            for dirpath, _, filenames in os.walk(top):
+                paths.extend(os.path.join(dirpath, f) for f in filenames)
+        snapshot = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def changes(self, timeout=None):
+        """Return set of changed paths, empty after timeout seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {
+                path for path in set(snapshot) | set(self._snapshot)
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(0.0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+def make_watcher(files=(), dirs=(), poll=False, interval=0.5,
+                 logger=logger):
+    """Return an InotifyWatcher, or a PollingWatcher if poll or unavailable."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(files, dirs)
+        except (OSError, AttributeError) as e:
+            if getattr(e, "errno", None) == errno.ENOSPC:
+                logger.warning("inotify watch limit reached.")
+            logger.debug(f"{__name__}: inotify unavailable: {e}.")
+    logger.debug(f"{__name__}: polling every {interval}s.")
+    return PollingWatcher(files, dirs, interval=interval)
+
+
+def _template_name(path):
+    """Return template name for a path under a template dir, else None."""
+    for top in render.TemplateDirs:
+        rel = os.path.relpath(path, top)
+        if rel.startswith(os.path.pardir):
+            continue
+        name = "/".join(rel.split(os.path.sep))
+        if name in render.Templates:
+            return name
+    return None
+
+
+def _forget_template(session, t_name):
+    """Drop the compiled and indexed state of t_name after an edit."""
+    index.forget(t_name)
+    cache = session.environment.cache
+    if cache is not None:
+        for key in list(cache.keys()):
+            if key[1] == t_name:
+                del cache[key]
+
+
+def watch(session, config_file, groups=None, base_path=None, debounce=0.2,
+          poll=False, interval=0.5, logger=logger):
+    """Generate the plan, then regenerate affected outputs on every change.
+
+    Runs until interrupted.
+    """
+    config_file = os.path.abspath(config_file)
+    session.warm_up()
+    context = session.context_for(settings.load(config_file, logger=logger))
+    outputs = session.plan(groups, context)
+    session.generate_outputs(outputs, context=context, base_path=base_path)
+    watcher = make_watcher(
+        files=[config_file], dirs=render.TemplateDirs, poll=poll,
+        interval=interval, logger=logger,
+    )
+    logger.info(
+        f"Watching {config_file} and {', '.join(render.TemplateDirs)}.")
+    try:
+        while True:
+            changed = watcher.changes()
+            while True:
+                more = watcher.changes(debounce)
+                if not more:
+                    break
+                changed |= more
+            keys = set()
+            previous = outputs
+            if config_file in changed:
+                try:
+                    new = session.context_for(
+                        settings.load(config_file, logger=logger))
+                except Exception as e:
+                    logger.error(f"Could not load {config_file}: {e}.")
+                    continue
+                keys = render.changed_keys(context, new)
+                context = new
+                outputs = session.plan(groups, context)
+            templates = {_template_name(path) for path in changed} - {None}
+            for t_name in templates:
+                _forget_template(session, t_name)
+            affected = render.affected_outputs(
+                outputs, keys, templates, previous)
+            if not affected:
+                logger.debug("No output affected.")
+                continue
+            what = ", ".join(sorted(keys | templates)) or "plan"
+            logger.info(
+                f"Changed {what}, regenerating {len(affected)} files.")
+            try:
+                session.generate_outputs(
+                    affected, context=context, base_path=base_path)
+            except Exception as e:
+                logger.error(f"Generation failed: {e}.")
+    except KeyboardInterrupt:
+        logger.info("Stopped watching.")
+    finally:
+        watcher.close()
@@ -1,8 +1,21 @@
 """Repodoc Template Writer module."""
 import os
+import mmap
+import stat
+import errno
+import shutil
+import difflib
+import hashlib
+import functools
 import logging
+import tempfile
+import itertools
+import threading
+
+from repodoc.profiling import phase
 
 logger = logging.getLogger("repodoc")
+WriteBufferSize = 1 << 16
 
 
 def prepare_destination(
@@ -24,8 +37,291 @@ def write_rendered_template(
     base_path=os.path.abspath(os.path.curdir),
     logger=logger,
 ):
-    """Write content to output filepath."""
-    prepped_path = prepare_destination(out_path, base_path=base_path)
-    with open(prepped_path, "w") as wf:
+    """Write content (str or iterable of str chunks) to output filepath."""
+    if not isinstance(content, str):
+        return write_stream(out_path, content, base_path=base_path,
+                            logger=logger)
+    prepped_path = prepare_destination(
+        out_path, base_path=base_path, logger=logger)
+    with phase("write", out_path), open(prepped_path, "w") as wf:
         wf.write(content)
     logger.info(f"Written {out_path}.")
+
+
+def write_chunks(wf, chunks):
+    """Write str chunks to binary file wf, return sha256 of the bytes."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        digest.update(data)
+        wf.write(data)
+    return digest.hexdigest()
+
+
+def write_stream(
+    out_path,
+    chunks,
+    base_path=os.path.abspath(os.path.curdir),
+    logger=logger,
+):
+    """Write iterable of str chunks to output filepath through a buffer.
+
+    Return sha256 hexdigest of the written bytes.
+    """
+    prepped_path = prepare_destination(
+        out_path, base_path=base_path, logger=logger)
+    with phase("write", out_path), open(
+        prepped_path, "wb", buffering=WriteBufferSize
+    ) as wf:
+        digest = write_chunks(wf, chunks)
+    logger.info(f"Written {out_path}.")
+    return digest
+
+
+def _stream_matches(path, chunks):
+    """Return True if the file at path holds exactly the str chunks."""
+    try:
+        rf = open(path, "rb", buffering=WriteBufferSize)
+    except OSError:
+        return False
+    with rf:
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            if rf.read(len(data)) != data:
+                return False
+        return rf.read(1) == b""
+
+
+def content_matches(path, content, chunk_size=1 << 20):
+    """Return True if the file at path holds exactly content.
+
+    For str or bytes content the file is memory-mapped and compared chunk
+    by chunk, so no copy of it is made. Any other content is treated as an
+    iterable of str chunks and compared while streaming through the file.
+    """
+    if not isinstance(content, (str, bytes)):
+        return _stream_matches(path, content)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    if size != len(data):
+        return False
+    if size == 0:
+        return True
+    view = memoryview(data)
+    with open(path, "rb") as rf, mmap.mmap(
+        rf.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        for offset in range(0, size, chunk_size):
+            if mm[offset:offset + chunk_size] != view[
+                    offset:offset + chunk_size]:
+                return False
+    return True
+
+
+def unified_diff(out_path, content, path=None):
+    """Return unified diff between the file at path and content."""
+    path = path or out_path
+    try:
+        with open(path, "r") as rf:
+            existing = rf.readlines()
+    except FileNotFoundError:
+        existing = []
+    lines = difflib.unified_diff(
+        existing,
+        content.splitlines(keepends=True),
+        fromfile=f"a/{out_path}",
+        tofile=f"b/{out_path}",
+    )
+    return "".join(
+        line if line.endswith("\n")
+        else line + "\n\\ No newline at end of file\n"
+        for line in lines
+    )
+
+
+FsyncModes = ["none", "file", "end"]
+
+
+def _replace(source, target, fsync=False):
+    """Move source onto target keeping target's mode, return the path.
+
+    A symlinked target has the file it resolves to replaced. When that file
+    is on another filesystem source is copied next to it first, and with
+    fsync the copy is flushed.
+    """
+    target = os.path.realpath(target)
+    try:
+        os.chmod(source, stat.S_IMODE(os.stat(target).st_mode))
+    except FileNotFoundError:
+        pass
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        fd, tmp = tempfile.mkstemp(
+            prefix=".repodoc-", dir=os.path.dirname(target))
+        os.close(fd)
+        try:
+            shutil.copy2(source, tmp)
+            if fsync:
+                _fsync_file(tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        os.remove(source)
+    return target
+
+
+def _fsync_file(path):
+    """Flush the data of the file at path."""
+    with open(path, "rb") as rf:
+        os.fsync(rf.fileno())
+
+
+def _fsync_dir(path):
+    """Flush the entries of directory path, where the OS supports it."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Transaction:
+    """Stage rendered templates and move them into place on commit.
+
+    Every write goes to a staging directory created inside base_path, so it
+    is on the same filesystem, and ``commit`` creates each missing output
+    directory once and ``os.replace``-s the staged files into place. An
+    interrupted run therefore never leaves truncated outputs behind; on
+    error the staged files are discarded.
+
+    An existing output keeps its file mode, and an output that is a symlink
+    has the file it points to replaced, not the link.
+
+    fsync is one of ``FsyncModes``: ``"none"`` leaves flushing to the OS,
+    ``"file"`` fsyncs every staged file as it is written and ``"end"``
+    fsyncs them all at commit, before the renames. Both fsync each output
+    directory once after the renames so that the commit itself is durable.
+
+    Use as a context manager::
+
+        with Transaction() as txn:
+            txn.write("docs/conf.py", content)
+    """
+
+    def __init__(
+        self,
+        base_path=os.path.abspath(os.path.curdir),
+        fsync="none",
+        logger=logger,
+    ):
+        if fsync not in FsyncModes:
+            raise ValueError(f"fsync must be one of {FsyncModes}.")
+        self.base_path = base_path
+        self.fsync = fsync
+        self.logger = logger
+        self.staging = None
+        self._staged = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _staging_dir(self):
+        with self._lock:
+            if self.staging is None:
+                os.makedirs(self.base_path, exist_ok=True)
+                self.staging = tempfile.mkdtemp(
+                    prefix=".repodoc-txn-", dir=self.base_path)
+        return self.staging
+
+    def write(self, out_path, content, logger=None):
+        """Stage content (str or iterable of str chunks) for out_path.
+
+        Return sha256 hexdigest of the staged bytes.
+        """
+        logger = logger or self.logger
+        if isinstance(content, str):
+            content = [content]
+        staged = os.path.join(self._staging_dir(), str(next(self._counter)))
+        with phase("write", out_path), open(
+            staged, "wb", buffering=WriteBufferSize
+        ) as wf:
+            digest = write_chunks(wf, content)
+            if self.fsync == "file":
+                wf.flush()
+                os.fsync(wf.fileno())
+        with self._lock:
+            self._staged[out_path] = staged
+        logger.debug(f"Staged {out_path}.")
+        return digest
+
+    def discard(self, out_path, logger=None):
+        """Drop the staged file for out_path."""
+        logger = logger or self.logger
+        with self._lock:
+            staged = self._staged.pop(out_path)
+        os.remove(staged)
+        logger.debug(f"Discarded {out_path}.")
+
+    def commit(self, logger=None, pool=None):
+        """Move all staged files into place, return list of out paths.
+
+        With pool, a concurrent.futures executor, directories are created
+        and files moved concurrently, which pays off on network filesystems.
+        """
+        with phase("write"):
+            return self._commit(logger=logger or self.logger, pool=pool)
+
+    def _commit(self, logger, pool=None):
+        if not self._staged:
+            self.rollback()
+            return []
+        run = pool.map if pool is not None else map
+        if self.fsync == "end":
+            list(run(_fsync_file, self._staged.values()))
+        out_paths = sorted(self._staged)
+        dirnames = sorted({
+            os.path.dirname(os.path.join(self.base_path, p))
+            for p in out_paths
+        })
+        sources = [self._staged.pop(out_path) for out_path in out_paths]
+        targets = [os.path.join(self.base_path, p) for p in out_paths]
+        list(run(functools.partial(os.makedirs, exist_ok=True), dirnames))
+        placed = list(run(
+            functools.partial(_replace, fsync=self.fsync != "none"),
+            sources, targets))
+        if self.fsync != "none":
+            list(run(_fsync_dir, sorted(
+                {os.path.dirname(p) for p in placed}
+                | {os.path.realpath(self.base_path)})))
+        for out_path in out_paths:
+            logger.info(f"Written {out_path}.")
+        self.rollback()
+        return out_paths
+
+    def rollback(self):
+        """Discard staged files and the staging directory."""
+        self._staged.clear()
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
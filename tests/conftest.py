@@ -0,0 +1,29 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep every on-disk cache of a test under tmp_path."""
+    monkeypatch.setenv("REPODOC_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("REPODOC_RENDER_CACHE_DIR", raising=False)
+    monkeypatch.delenv("REPODOC_SOCKET", raising=False)
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    """Return a user template dir layered over the built-in templates."""
+    from repodoc import index, memo, render
+
+    path = tmp_path / "templates"
+    path.mkdir()
+    monkeypatch.setenv("REPODOC_TEMPLATE_PATH", str(path))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("REPODOC_ORG_TEMPLATE_PATH", "")
+    for name in render._LAZY_ATTRIBUTES:
+        monkeypatch.delitem(vars(render), name, raising=False)
+    monkeypatch.setattr(index, "_index", None)
+    monkeypatch.setattr(index, "_verified", {})
+    memo.clear()
+    yield path
+    memo.clear()
@@ -0,0 +1,45 @@
+import arrow
+import pytest
+
+from repodoc import render
+from repodoc.session import RepoDocSession, Engines
+
+CONTEXT = {"author_username": "someone", "repo_name": "project",
+           "licence": "MIT"}
+
+
+def test_async_engine_streams(tmp_path, monkeypatch):
+    def render_template(*args, **kwargs):
+        raise AssertionError("rendered as a whole")
+
+    monkeypatch.setattr(render, "render_template", render_template)
+    session = RepoDocSession(context=CONTEXT, base_path=str(tmp_path),
+                             engine="async")
+    report = session.generate_group("readme")
+    assert report["written"] == ["README.md"]
+    assert "project" in (tmp_path / "README.md").read_text()
+
+
+def tree(path):
+    return {
+        str(p.relative_to(path)): p.read_bytes()
+        for p in sorted(path.rglob("*"))
+        if p.is_file() and p.name != ".repodoc.lock"
+    }
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_async_engine_matches_threads(tmp_path, monkeypatch, incremental):
+    # Some templates render the time to the second.
+    frozen = arrow.get(1700000000)
+    monkeypatch.setattr(arrow, "now", lambda tz=None: frozen.to(tz or "local"))
+    runs = {}
+    for engine in Engines:
+        base_path = tmp_path / engine
+        session = RepoDocSession(context=CONTEXT, base_path=str(base_path),
+                                 engine=engine, jobs=4)
+        reports = [session.generate_plan(incremental=incremental)
+                   for _ in range(2)]
+        runs[engine] = (reports, tree(base_path))
+    assert runs["threads"][0][0]["written"]
+    assert runs["async"] == runs["threads"]
@@ -0,0 +1,35 @@
+from repodoc import batch
+
+CONTEXT = {
+    "author_name": "A", "author_username": "a", "program_name": "p",
+    "licence": "MIT", "repo_name": "r", "package_name": "p",
+}
+
+
+def job(tmp_path, **context):
+    return {
+        "output": str(tmp_path / "out"),
+        "context": dict(CONTEXT, **context),
+        "groups": None,
+    }
+
+
+def test_outputs_follow_config_flags(tmp_path):
+    outputs = [out for _, out in batch.job_outputs(job(tmp_path))]
+    assert len(outputs) == len(set(outputs))
+    assert "setup.py" in outputs
+    outputs = [
+        out for _, out in batch.job_outputs(job(tmp_path, pypi=False))]
+    assert "setup.py" not in outputs and "setup.cfg" not in outputs
+
+
+def test_run_job_and_dry_run(tmp_path):
+    paths, _ = batch.run_job(job(tmp_path))
+    assert (tmp_path / "out" / "README.md").exists()
+    assert sorted(paths) == sorted(
+        out for _, out in batch.job_outputs(job(tmp_path)))
+    (tmp_path / "out" / "README.md").write_text("edited")
+    dry = dict(job(tmp_path), dry_run=True)
+    paths, diffs = batch.run_job(dry)
+    assert "README.md" in paths and diffs == {}
+    assert (tmp_path / "out" / "README.md").read_text() == "edited"
@@ -0,0 +1,13 @@
+import os
+
+from repodoc import cache
+
+
+def test_clear_keeps_foreign_files():
+    root = cache.cache_dir()
+    cache.version_dir("bytecode")
+    for name in ("renders", "notes"):
+        os.makedirs(os.path.join(root, name))
+    open(os.path.join(root, "repodoc.sock"), "w").close()
+    cache.clear()
+    assert sorted(os.listdir(root)) == ["notes", "repodoc.sock"]
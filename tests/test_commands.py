@@ -0,0 +1,98 @@
+import pytest
+
+from repodoc import commands
+
+CONTEXT = {"program_name": "", "version": "", "licence": ""}
+
+
+def test_answers_keep_scalars_as_written(tmp_path):
+    path = tmp_path / "answers.yml"
+    path.write_text("version: 1.10\npypi: no\n")
+    answers = commands.load_answers(str(path))
+    assert answers == {"version": "1.10", "pypi": "no"}
+    context = commands.validate_answers(CONTEXT, answers)
+    assert context["version"] == "1.10"
+    assert context["pypi"] is False
+
+
+def test_numeric_answer_is_rejected():
+    with pytest.raises(ValueError, match="version: expected a string"):
+        commands.validate_answers(CONTEXT, {"version": 1.1})
+
+
+def test_profile_flag_leaves_subcommand_alone():
+    args = commands.get_main_parser().parse_args(["--profile", "all"])
+    assert args.profile is True
+    assert args.profile_output == "repodoc-profile.json"
+    assert args.func is commands.all_groups
+
+
+def cli_args(**kwargs):
+    """Return parsed args of a plain ``repodoc`` run updated with kwargs."""
+    args = commands.get_main_parser().parse_args(["--no-daemon", "all"])
+    vars(args).update(kwargs)
+    return args
+
+
+def test_regenerate_leaves_missing_outputs_out(tmp_path):
+    tmp_path = tmp_path / "repo"
+    tmp_path.mkdir()
+    old = {"author_email": "a@b", "licence": "MIT"}
+    new = dict(old, author_email="c@d")
+    report = commands.regenerate_dependents(
+        old, new, cli_args(), base_path=str(tmp_path))
+    assert not report["written"]
+    assert not list(tmp_path.iterdir())
+    security = tmp_path / ".github" / "SECURITY.md"
+    security.parent.mkdir()
+    security.write_text("a@b")
+    report = commands.regenerate_dependents(
+        old, new, cli_args(), base_path=str(tmp_path))
+    assert report["written"] == [".github/SECURITY.md"]
+    assert "c@d" in security.read_text()
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [
+        "SECURITY.md"]
+
+
+def test_regenerate_dry_run_writes_nothing(tmp_path, capsys):
+    security = tmp_path / ".github" / "SECURITY.md"
+    security.parent.mkdir()
+    security.write_text("a@b")
+    old = {"author_email": "a@b", "licence": "MIT"}
+    args = cli_args(dry_run=True)
+    commands.regenerate_dependents(
+        old, dict(old, author_email="c@d"), args, base_path=str(tmp_path))
+    assert security.read_text() == "a@b"
+    assert args.drift == [".github/SECURITY.md"]
+    assert capsys.readouterr().out == ".github/SECURITY.md\n"
+
+
+def test_dry_run_and_diff_leave_files_alone(tmp_path, capsys):
+    kwargs = {"repo_name": "project", "author_username": "someone"}
+    commands.generate_group("readme", kwargs, cli_args(),
+                            base_path=str(tmp_path))
+    readme = tmp_path / "README.md"
+    args = cli_args(dry_run=True)
+    commands.generate_group("readme", kwargs, args, base_path=str(tmp_path))
+    assert args.drift == []
+    readme.write_text("edited\n")
+    capsys.readouterr()
+    args = cli_args(diff=True)
+    commands.generate_group("readme", kwargs, args, base_path=str(tmp_path))
+    out = capsys.readouterr().out
+    assert args.drift == ["README.md"]
+    assert "--- a/README.md" in out and "\n-edited\n" in out
+    assert readme.read_text() == "edited\n"
+
+
+def test_all_generates_the_plan_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "repodoc_config.yml").write_text(
+        "repo_name: project\nlicence: MIT\npypi: false\n")
+    report = commands.all_groups(cli_args())
+    written = sorted(
+        str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*")
+        if p.is_file() and p.name != "repodoc_config.yml"
+        and "cache" not in p.parts)
+    assert written == sorted(report["written"])
+    assert "LICENCE" in written and "setup.py" not in written
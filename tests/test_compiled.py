@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from repodoc import compiled
+from repodoc import render
+
+
+@pytest.fixture
+def target(tmp_path):
+    target = str(tmp_path / "compiled")
+    compiled.compile_templates(render.make_environment(), target=target)
+    return target
+
+
+def test_manifest_records_versions(target):
+    manifest = compiled.load_manifest(target)
+    assert "README.md.j2" in manifest
+
+
+def test_other_jinja2_release_falls_back_to_source(target, monkeypatch):
+    monkeypatch.setattr(compiled.jinja2, "__version__", "0.0")
+    assert compiled.load_manifest(target) == {}
+    loader = compiled.PrecompiledLoader(
+        render._make_source_loader(), target=target)
+    assert not loader.is_fresh("README.md.j2")
+
+
+def test_other_repodoc_release_falls_back_to_source(target):
+    filename = f"{target}/{compiled.ManifestFile}"
+    with open(filename) as rf:
+        manifest = json.load(rf)
+    manifest["versions"]["repodoc"] = "0.0.0"
+    with open(filename, "w") as wf:
+        json.dump(manifest, wf)
+    assert compiled.load_manifest(target) == {}
@@ -0,0 +1,28 @@
+import json
+
+from repodoc import index
+from repodoc import render
+
+
+def test_shipped_index_is_current(template_dir):
+    with open(index.IndexFile) as rf:
+        shipped = json.load(rf)
+    assert sorted(shipped) == sorted(render.Templates)
+    for t_name, entry in shipped.items():
+        assert entry["sha256"] == index.source_hash(t_name), t_name
+        assert entry["variables"] == render.parse_variables(t_name), t_name
+
+
+def test_edited_template_is_reindexed_once(template_dir, monkeypatch):
+    (template_dir / "README.md.j2").write_text("{{ custom_key }}")
+    assert render.get_variables("README.md.j2") == ["custom_key"]
+    with open(index._cache_file()) as rf:
+        assert json.load(rf)["README.md.j2"]["variables"] == ["custom_key"]
+
+    def parse_variables(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(render, "parse_variables", parse_variables)
+    monkeypatch.setattr(index, "_index", None)
+    index.forget()
+    assert render.get_variables("README.md.j2") == ["custom_key"]
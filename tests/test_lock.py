@@ -0,0 +1,76 @@
+import pytest
+
+from repodoc import index
+from repodoc import lock
+from repodoc import render
+
+T_NAME = "docs/index.rst.j2"
+CONTEXT = {"program_name": "p", "author_name": "A", "version": "1.0"}
+
+
+@pytest.fixture
+def generated(tmp_path):
+    """Render T_NAME to disk and return (path, lock entry)."""
+    path = tmp_path / "index.rst"
+    content = render.render_template(T_NAME, **CONTEXT)[-1]
+    path.write_text(content)
+    status, t_hash, ctx_hash, _ = lock.plan_output(
+        T_NAME, CONTEXT, None, str(path))
+    assert status is None
+    entry = lock.make_entry(
+        T_NAME, t_hash, ctx_hash, lock.content_hash(content))
+    return path, lock.stamp_entry(entry, str(path))
+
+
+def test_unchanged_is_skipped(generated):
+    path, entry = generated
+    assert lock.plan_output(T_NAME, CONTEXT, entry, str(path))[0] == (
+        lock.SKIPPED)
+
+
+def test_clock_only_change_is_skipped(generated, monkeypatch):
+    path, entry = generated
+    assert index.lookup(T_NAME)["now"]
+    monkeypatch.setattr(index, "now_values", lambda *a, **kw: ["later"])
+    assert lock.plan_output(T_NAME, CONTEXT, entry, str(path))[0] == (
+        lock.SKIPPED)
+
+
+def test_variable_change_needs_render(generated):
+    path, entry = generated
+    context = dict(CONTEXT, program_name="other")
+    assert lock.plan_output(T_NAME, context, entry, str(path))[0] is None
+
+
+def test_unrelated_variable_change_is_skipped(generated):
+    path, entry = generated
+    context = dict(CONTEXT, unrelated="x")
+    assert lock.plan_output(T_NAME, context, entry, str(path))[0] == (
+        lock.SKIPPED)
+
+
+def test_edited_output_is_a_conflict(generated):
+    path, entry = generated
+    path.write_text("edited by hand")
+    assert lock.plan_output(T_NAME, CONTEXT, entry, str(path))[0] == (
+        lock.CONFLICT)
+
+
+def test_missing_output_needs_render(generated):
+    path, entry = generated
+    path.unlink()
+    assert lock.plan_output(T_NAME, CONTEXT, entry, str(path))[0] is None
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_plain_run_refreshes_lock(tmp_path, engine):
+    from repodoc.session import RepoDocSession
+
+    session = RepoDocSession(context=CONTEXT, base_path=str(tmp_path),
+                             engine=engine)
+    session.generate_group("sphinx_docs", incremental=True)
+    session.generate_group("sphinx_docs", context={"version": "2.0"})
+    report = session.generate_group(
+        "sphinx_docs", context={"version": "2.0"}, incremental=True)
+    assert not report[lock.CONFLICT]
+    assert not report[lock.WRITTEN]
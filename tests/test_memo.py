@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from repodoc import memo
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    root = tmp_path / "renders"
+    monkeypatch.setenv("REPODOC_RENDER_CACHE_DIR", str(root))
+    memo.clear()
+    yield root
+    memo.clear()
+
+
+def test_put_get_round_trip(store):
+    memo.put("ab" * 32, "content")
+    memo.clear()
+    assert memo.get("ab" * 32) == "content"
+    assert not [p for p in store.rglob("*") if p.name.endswith(".tmp")]
+
+
+def test_corrupt_entry_is_a_miss(store):
+    key = "cd" * 32
+    memo.put(key, "content")
+    memo.clear()
+    path = store / key[:2] / key
+    path.write_bytes(path.read_bytes()[:-2])
+    assert memo.get(key) is None
+
+
+def test_hit_when_store_cannot_be_touched(store, monkeypatch):
+    key = "ef" * 32
+    memo.put(key, "content")
+    memo.clear()
+
+    def utime(*args):
+        raise PermissionError(args)
+
+    monkeypatch.setattr(os, "utime", utime)
+    assert memo.get(key) == "content"
+
+
+def test_evicts_at_most_once_per_interval(store, monkeypatch):
+    calls = []
+    monkeypatch.setattr(memo, "evict", lambda logger=None: calls.append(1)
+                        or 0)
+    for _ in range(2):
+        memo.put(os.urandom(32).hex(), "content")
+        memo._count("misses")
+        memo.flush_stats()
+    assert calls == [1]
+    assert memo.store_stats()["misses"] >= 2
+
+
+def test_evict_removes_least_recently_used(store):
+    keys = [f"{i:02x}" * 32 for i in range(4)]
+    for n, key in enumerate(keys):
+        memo.put(key, "x" * 100)
+        path = store / key[:2] / key
+        os.utime(path, (n, n))
+    removed = memo.evict(limit=2 * (100 + memo.HeaderSize))
+    assert removed == 3
+    assert (store / keys[-1][:2] / keys[-1]).exists()
+
+
+def test_stream_stores_miss_and_streams_hit(store, monkeypatch):
+    monkeypatch.setattr(memo, "render_key", lambda *a, **kw: "12" * 32)
+    text = "é" * memo.ReadSize + "end"
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return iter([text[:5], text[5:]])
+
+    assert "".join(memo.stream("t", {}, generate)) == text
+    chunks = list(memo.stream("t", {}, generate))
+    assert calls == [1]
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+
+
+def test_abandoned_stream_is_not_stored(store, monkeypatch):
+    monkeypatch.setattr(memo, "render_key", lambda *a, **kw: "34" * 32)
+    chunks = memo.stream("t", {}, lambda: iter(["a", "b"]))
+    next(chunks)
+    chunks.close()
+    assert not [p for p in store.rglob("*") if p.is_file()]
+
+
+def test_stream_template_uses_store(store):
+    from repodoc import render
+
+    context = {"author_name": "Someone", "program_name": "project"}
+    t_name = render.LicenceMap["GPLv3"]
+    first = "".join(render.stream_template(t_name, **context)[-1])
+    hits = memo.stats["disk_hits"]
+    second = "".join(render.stream_template(t_name, **context)[-1])
+    assert first == second
+    assert memo.stats["disk_hits"] == hits + 1
+
+
+def test_key_covers_included_templates(store, template_dir):
+    from repodoc import index, render
+
+    (template_dir / "README.md.j2").write_text(
+        "{{ program_name }}: {% include 'partial.txt' %}")
+    partial = template_dir / "partial.txt"
+    partial.write_text("first")
+    assert render.render_template(
+        "README.md.j2", program_name="p")[-1] == "p: first"
+    partial.write_text("second")
+    index.forget("partial.txt")
+    assert render.render_template(
+        "README.md.j2", program_name="p")[-1] == "p: second"
+
+
+def test_dynamic_reference_is_not_cached(store, template_dir):
+    from repodoc import render
+
+    (template_dir / "README.md.j2").write_text("{% include name %}")
+    (template_dir / "partial.txt").write_text("partial")
+    assert memo.render_key("README.md.j2", {"name": "partial.txt"}) is None
+    assert render.render_template(
+        "README.md.j2", name="partial.txt")[-1] == "partial"
+
+
+def test_stores_without_fchmod(store, monkeypatch):
+    monkeypatch.delattr(os, "fchmod", raising=False)
+    memo.put("12" * 32, "content")
+    memo.clear()
+    assert memo.get("12" * 32) == "content"
@@ -0,0 +1,20 @@
+import pytest
+
+from repodoc import profiling
+
+
+@pytest.mark.parametrize("reset_peak", [True, False])
+def test_phases_recorded(monkeypatch, reset_peak):
+    if not reset_peak:
+        monkeypatch.setattr(profiling, "_reset_peak", None)
+    profiling.start()
+    try:
+        with profiling.phase("render", "a"):
+            with profiling.phase("write", "a"):
+                data = [0] * 100000
+            del data
+    finally:
+        report = profiling.stop()
+    assert report["phases"]["render"]["calls"] == 1
+    assert report["phases"]["write"]["items"]["a"]["calls"] == 1
+    assert report["phases"]["write"]["tracemalloc_peak"] > 0
@@ -0,0 +1,105 @@
+import hashlib
+
+import pytest
+
+from repodoc import render
+from repodoc import writer
+
+CONTEXT = {"author_name": "Someone", "program_name": "project"}
+
+
+@pytest.mark.parametrize("cache", ["0", "1"])
+def test_stream_matches_render(monkeypatch, cache):
+    monkeypatch.setenv("REPODOC_RENDER_CACHE", cache)
+    t_name = render.LicenceMap["GPLv3"]
+    content = render.render_template(t_name, **CONTEXT)[-1]
+    for _ in range(2):
+        out_path, chunks = render.stream_template(t_name, **CONTEXT)
+        assert not isinstance(chunks, (str, list))
+        assert "".join(chunks) == content
+    assert out_path == "licences/GPLv3"
+
+
+def test_write_stream_returns_digest(tmp_path):
+    chunks = ["a" * 10, "é", "b"]
+    digest = writer.write_stream("docs/out.txt", iter(chunks),
+                                 base_path=str(tmp_path))
+    data = (tmp_path / "docs" / "out.txt").read_bytes()
+    assert data == "".join(chunks).encode("utf-8")
+    assert digest == hashlib.sha256(data).hexdigest()
+
+
+def test_plan_follows_config_flags():
+    context = {"licence": "MIT", "pypi": False, "readthedocs": False}
+    groups = render.plan_groups(context)
+    assert "pypi_project" not in groups
+    assert groups[0] == "licence" and "sphinx_docs" in groups
+    outputs = render.plan_outputs(groups, context)
+    paths = [out_path for _, out_path in outputs]
+    assert len(paths) == len(set(paths))
+    assert ".readthedocs.yaml" not in paths and "setup.py" not in paths
+    assert "LICENCE" in paths and "docs/conf.py" in paths
+
+
+def test_affected_outputs_follow_changed_keys():
+    old = {"licence": "MIT", "author_email": "a@b", "version": "1"}
+    new = dict(old, author_email="c@d", pypi=False)
+    assert render.changed_keys(old, new) == {"author_email", "pypi"}
+    outputs = render.plan_outputs(render.plan_groups(new), new)
+    graph = render.dependency_graph(outputs)
+    affected = render.affected_outputs(outputs, keys={"author_email"})
+    assert affected == graph["author_email"]
+    assert ("setup.cfg.j2", "setup.cfg") not in affected
+    assert (".github/SECURITY.md.j2", ".github/SECURITY.md") in affected
+
+
+def test_affected_outputs_include_outputs_new_to_the_plan():
+    old = {"licence": "MIT", "pypi": False}
+    new = dict(old, pypi=True)
+    previous = render.plan_outputs(render.plan_groups(old), old)
+    outputs = render.plan_outputs(render.plan_groups(new), new)
+    affected = render.affected_outputs(outputs, previous=previous)
+    assert sorted(out_path for _, out_path in affected) == [
+        "MANIFEST.in", "setup.cfg", "setup.py"]
+
+
+def test_user_templates_override_org_and_builtin(template_dir, tmp_path,
+                                                 monkeypatch):
+    org = tmp_path / "org"
+    (org / "licences").mkdir(parents=True)
+    (org / "licences" / "ORG.j2").write_text("org {{ author_name }}")
+    (org / "README.md.j2").write_text("org readme")
+    (template_dir / "README.md.j2").write_text("user readme")
+    monkeypatch.setenv("REPODOC_ORG_TEMPLATE_PATH", str(org))
+    assert render.TemplateDirs == [
+        str(template_dir), str(org), render.TemplatesDir]
+    assert render.render_template("README.md.j2")[-1] == "user readme"
+    assert render.LicenceMap["ORG"] == "licences/ORG.j2"
+    assert render.render_licence("ORG", author_name="A")[-1] == "org A"
+    assert "MIT" in render.LicenceMap
+
+
+def test_override_includes_a_partial(template_dir):
+    (template_dir / "README.md.j2").write_text(
+        "{% include 'partial.txt' %}")
+    (template_dir / "partial.txt").write_text("partial")
+    assert render.render_template("README.md.j2")[-1] == "partial"
+
+
+def test_discovery_is_cached_until_a_dir_changes(template_dir, monkeypatch):
+    (template_dir / "extra.txt.j2").write_text("x")
+    assert "extra.txt.j2" in render.Templates
+    scans = []
+    scan = render._scan
+
+    def counted(dirs):
+        scans.append(dirs)
+        return scan(dirs)
+
+    monkeypatch.setattr(render, "_scan", counted)
+    assert "extra.txt.j2" in render._discover()["Templates"]
+    assert scans == []
+    (template_dir / "docs").mkdir()
+    (template_dir / "docs" / "extra.rst.j2").write_text("x")
+    assert "docs/extra.rst.j2" in render._discover()["DocTemplates"]
+    assert len(scans) == 1
@@ -0,0 +1,103 @@
+import os
+import logging
+import socket
+import threading
+import socketserver
+
+import pytest
+
+import repodoc
+from repodoc import server
+
+
+def test_refuses_other_version():
+    response = server.handle_request(
+        {"op": "render", "groups": [], "version": "0.0.0"})
+    assert not response["ok"]
+    assert "0.0.0" in response["mismatch"]
+
+
+def test_refuses_other_template_path(monkeypatch):
+    monkeypatch.delenv("REPODOC_TEMPLATE_PATH", raising=False)
+    response = server.handle_request({
+        "op": "render", "groups": [], "version": repodoc.__version__,
+        "env": {"REPODOC_TEMPLATE_PATH": "/elsewhere"},
+    })
+    assert "REPODOC_TEMPLATE_PATH" in response["mismatch"]
+
+
+def test_serves_matching_client():
+    response = server.handle_request({
+        "op": "render", "groups": ["readme"], "version": repodoc.__version__,
+        "env": {k: os.environ[k] for k in server.EnvironmentKeys
+                if k in os.environ},
+        "context": {"repo_name": "r", "author_username": "u"},
+    })
+    assert response["ok"]
+    assert "README.md" in response["files"]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = str(tmp_path / "d.sock")
+    srv = socketserver.ThreadingUnixStreamServer(
+        path, server._make_handler(server.logger))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_request_round_trip(daemon):
+    response = server.request({"op": "ping"}, path=daemon)
+    assert response == {"ok": True, "version": repodoc.__version__}
+
+
+@pytest.mark.parametrize("error", [PermissionError, socket.timeout])
+def test_request_falls_back_on_socket_errors(daemon, monkeypatch, error):
+    def connect(self, address):
+        raise error("unreachable")
+
+    monkeypatch.setattr(socket.socket, "connect", connect)
+    assert server.request({"op": "ping"}, path=daemon) is None
+
+
+def test_find_socket_follows_serve_pointer(tmp_path, monkeypatch, daemon):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    assert server.find_socket() is None
+    (tmp_path / "run").mkdir()
+    with open(server.socket_path() + ".path", "w") as wf:
+        wf.write(daemon)
+    assert server.find_socket() == daemon
+
+
+def test_shared_session_keeps_no_records(monkeypatch):
+    monkeypatch.setattr(server, "_session", None)
+    payload = {"op": "render", "groups": ["readme"],
+               "context": {"repo_name": "r"}}
+    for _ in range(3):
+        assert server.handle_request(payload)["ok"]
+    session = server._get_session()
+    assert server._get_session() is session
+    assert all(isinstance(h, logging.NullHandler)
+               for h in session.logger.handlers)
+
+
+def test_session_delegates_to_daemon(daemon, monkeypatch, tmp_path):
+    from repodoc.session import RepoDocSession
+
+    served = []
+
+    def generate(payload):
+        served.append(payload["group"])
+        return server._generate(payload)
+
+    monkeypatch.setenv("REPODOC_SOCKET", daemon)
+    monkeypatch.setitem(server._OPS, "generate", generate)
+    session = RepoDocSession(use_daemon=True, base_path=str(tmp_path))
+    report = session.generate_group(
+        "readme", context={"repo_name": "r", "author_username": "u"})
+    assert served == ["readme"]
+    assert report["written"] == ["README.md"]
+    assert "/r" in (tmp_path / "README.md").read_text()
@@ -0,0 +1,56 @@
+import logging
+
+from repodoc.session import RepoDocSession
+
+CONTEXT = {"author_username": "someone", "repo_name": "project",
+           "author_email": "someone@example.com", "licence": "MIT"}
+
+
+def tree(path):
+    return {
+        str(p.relative_to(path)): p.read_bytes()
+        for p in sorted(path.rglob("*")) if p.is_file()
+    }
+
+
+def test_jobs_match_serial_run(tmp_path, caplog, monkeypatch):
+    monkeypatch.setenv("REPODOC_RENDER_CACHE", "0")
+    runs = {}
+    for jobs in (1, 4):
+        caplog.clear()
+        base_path = tmp_path / f"jobs{jobs}"
+        session = RepoDocSession(context=CONTEXT, base_path=str(base_path),
+                                 jobs=jobs)
+        with caplog.at_level(logging.DEBUG, logger="repodoc"):
+            report = session.generate_group("community_health")
+        runs[jobs] = (report, tree(base_path), caplog.messages)
+    assert runs[1][0]["written"]
+    assert runs[1] == runs[4]
+
+
+def test_render_group_in_memory(tmp_path):
+    base_path = tmp_path / "repo"
+    session = RepoDocSession(context=CONTEXT, base_path=str(base_path))
+    files = session.render_group("licence")
+    assert list(files) == ["LICENCE"]
+    assert not base_path.exists()
+    assert session.write(files) == ["LICENCE"]
+    assert (base_path / "LICENCE").read_text() == files["LICENCE"]
+
+
+def test_sessions_share_one_environment(tmp_path):
+    from repodoc import render
+
+    first = RepoDocSession(context=CONTEXT)
+    second = RepoDocSession(context=dict(CONTEXT, repo_name="other"))
+    assert first.environment is second.environment is render.Environment
+    assert first.render_group("readme") != second.render_group("readme")
+
+
+def test_config_file_and_context_merge(tmp_path):
+    config = tmp_path / "repodoc_config.yml"
+    config.write_text("repo_name: from_file\nlicence: MIT\n")
+    session = RepoDocSession(config_file=str(config),
+                             context={"licence": "ISC"})
+    assert session.context == {"repo_name": "from_file", "licence": "ISC"}
+    assert session.outputs("licence") == [("licences/ISC.j2", "LICENCE")]
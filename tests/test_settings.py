@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from repodoc import settings
+
+
+@pytest.fixture
+def config(tmp_path):
+    settings.clear()
+    path = tmp_path / "repodoc_config.yml"
+    path.write_text("repo_name: project\nversion: '1.10'\n")
+    yield path
+    settings.clear()
+
+
+def test_load_is_memoized_until_changed(config, monkeypatch):
+    monkeypatch.setattr(settings, "stats", dict.fromkeys(settings.stats, 0))
+    first = settings.load(str(config))
+    first["repo_name"] = "mutated"
+    assert settings.load(str(config))["repo_name"] == "project"
+    assert settings.stats["parsed"] == 1
+    assert settings.stats["memo_hits"] == 1
+    config.write_text("repo_name: renamed\n")
+    os.utime(config, ns=(0, 0))
+    assert settings.load(str(config)) == {"repo_name": "renamed"}
+    assert settings.stats["parsed"] == 2
+
+
+def test_json_cache_is_reused_by_later_processes(config, monkeypatch):
+    monkeypatch.setattr(settings, "stats", dict.fromkeys(settings.stats, 0))
+    data = settings.load(str(config), json_cache=True)
+    assert os.path.exists(settings.json_cache_path(str(config)))
+    settings.clear()
+    assert settings.load(str(config), json_cache=True) == data
+    assert settings.stats == {"parsed": 1, "memo_hits": 0, "json_hits": 1}
+
+
+def test_dump_refreshes_the_memo(config):
+    settings.load(str(config))
+    settings.dump(str(config), {"repo_name": "dumped"})
+    assert settings.load(str(config)) == {"repo_name": "dumped"}
@@ -0,0 +1,106 @@
+import os
+import tarfile
+import zipfile
+import subprocess
+
+import pytest
+
+from repodoc import sinks
+from repodoc.session import RepoDocSession, Engines
+
+CONTEXT = {"author_username": "someone", "repo_name": "project"}
+
+
+@pytest.mark.parametrize("engine", Engines)
+def test_archive_sink_written_once(tmp_path, engine):
+    target = tmp_path / "out.tar.gz"
+    session = RepoDocSession(engine=engine, base_path=str(tmp_path))
+    session.generate_group(
+        "readme", context=CONTEXT, sink=sinks.ArchiveSink(str(target)))
+    with tarfile.open(target) as tf:
+        assert tf.getnames() == ["README.md"]
+
+
+@pytest.mark.parametrize("engine", Engines)
+def test_git_sink_single_commit(tmp_path, engine):
+    target = tmp_path / "stream"
+    session = RepoDocSession(engine=engine, base_path=str(tmp_path))
+    session.generate_group(
+        "readme", context=CONTEXT,
+        sink=sinks.GitSink(target=str(target), branch="scaffold"),
+    )
+    stream = target.read_bytes()
+    assert stream.count(b"\ncommit refs/heads/scaffold\n") == 1
+    assert b"M 100644 :1 README.md\n" in stream
+
+
+@pytest.mark.parametrize("name", ["out.zip", "out.tar.xz"])
+def test_archive_sink_stages_on_disk(tmp_path, name):
+    target = tmp_path / name
+    sink = sinks.ArchiveSink(str(target))
+    with sink:
+        sink.write("b.txt", iter(["b", "b"]))
+        sink.write("a.txt", "a")
+        sink.write("c.txt", "c")
+        sink.discard("c.txt")
+        staging = sink.staging
+        assert sorted(os.listdir(staging)) == ["0", "1"]
+    assert not os.path.exists(staging)
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(target) as zf:
+            members = {n: zf.read(n) for n in zf.namelist()}
+    else:
+        with tarfile.open(target) as tf:
+            members = {n: tf.extractfile(n).read() for n in tf.getnames()}
+    assert list(members.items()) == [("a.txt", b"a"), ("b.txt", b"bb")]
+
+
+def test_archive_sink_rollback_removes_staging(tmp_path):
+    sink = sinks.ArchiveSink(str(tmp_path / "out.tar"))
+    with pytest.raises(RuntimeError):
+        with sink:
+            sink.write("a.txt", "a")
+            staging = sink.staging
+            raise RuntimeError
+    assert not os.path.exists(staging)
+    assert not (tmp_path / "out.tar").exists()
+
+
+def test_memory_sink_second_commit_is_noop():
+    sink = sinks.MemorySink()
+    with sink:
+        sink.write("a.txt", "a")
+    assert sink.commit() == []
+    assert sink.files == {"a.txt": b"a"}
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo)] + list(args), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "someone")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "someone@example.com")
+    repo = tmp_path / "repo"
+    git(tmp_path, "init", "-q", "-b", "main", str(repo))
+    git(repo, "commit", "-q", "--allow-empty", "-m", "init")
+    return repo
+
+
+def test_git_sink_refuses_checked_out_branch(repo):
+    sink = sinks.GitSink(repo=str(repo), branch="main")
+    sink.write("README.md", "x")
+    with pytest.raises(RuntimeError):
+        sink.commit()
+
+
+def test_git_sink_commits_other_branch(repo):
+    with sinks.GitSink(repo=str(repo), branch="scaffold") as sink:
+        sink.write("README.md", "x")
+    out = subprocess.run(
+        ["git", "-C", str(repo), "show", "scaffold:README.md"],
+        stdout=subprocess.PIPE, check=True).stdout
+    assert out == b"x"
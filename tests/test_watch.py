@@ -0,0 +1,66 @@
+import pytest
+
+from repodoc import watch
+from repodoc.session import RepoDocSession
+
+
+class ScriptedWatcher:
+    """Watcher returning the changes made by each step in turn."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def changes(self, timeout=None):
+        if timeout is not None:
+            return set()
+        if not self.steps:
+            raise KeyboardInterrupt
+        return self.steps.pop(0)()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def watched(tmp_path, template_dir):
+    (template_dir / "README.md.j2").write_text(
+        "{{ repo_name }}: {% include 'partial.txt' %}")
+    (template_dir / "partial.txt").write_text("first")
+    config = tmp_path / "repodoc_config.yml"
+    config.write_text("repo_name: one\nversion: '1'\n")
+    return template_dir, config, tmp_path / "repo"
+
+
+def test_watch_regenerates_affected_outputs(watched, monkeypatch):
+    template_dir, config, base_path = watched
+    readme = base_path / "README.md"
+    seen = []
+
+    def edit(path, text):
+        def step():
+            seen.append(readme.read_text())
+            path.write_text(text)
+            return {str(path)}
+        return step
+
+    monkeypatch.setattr(watch, "make_watcher", lambda **kwargs: (
+        ScriptedWatcher([
+            edit(template_dir / "partial.txt", "second"),
+            edit(config, "repo_name: three\nversion: '1'\n"),
+            edit(config, "repo_name: three\nversion: '1.0'\n"),
+        ])))
+    generated = []
+    session = RepoDocSession()
+    generate_outputs = session.generate_outputs
+
+    def record(outputs, **kwargs):
+        generated.append([out_path for _, out_path in outputs])
+        return generate_outputs(outputs, **kwargs)
+
+    monkeypatch.setattr(session, "generate_outputs", record)
+    watch.watch(session, str(config), groups=["readme"],
+                base_path=str(base_path), debounce=0)
+    seen.append(readme.read_text())
+    assert seen == ["one: first", "one: second", "three: second",
+                    "three: second"]
+    assert generated == [["README.md"]] * 3
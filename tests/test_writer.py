@@ -0,0 +1,60 @@
+import os
+import stat
+
+import pytest
+
+from repodoc import writer
+
+
+def test_commit_keeps_file_mode(tmp_path):
+    target = tmp_path / "setup.py"
+    target.write_text("old")
+    target.chmod(0o755)
+    with writer.Transaction(base_path=str(tmp_path)) as txn:
+        txn.write("setup.py", "new")
+    assert target.read_text() == "new"
+    assert stat.S_IMODE(target.stat().st_mode) == 0o755
+
+
+def test_commit_writes_through_symlink(tmp_path):
+    shared = tmp_path / "shared" / "LICENCE"
+    shared.parent.mkdir()
+    shared.write_text("old")
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "LICENCE").symlink_to(shared)
+    with writer.Transaction(base_path=str(repo)) as txn:
+        txn.write("LICENCE", "new")
+    assert (repo / "LICENCE").is_symlink()
+    assert shared.read_text() == "new"
+
+
+@pytest.mark.parametrize("fsync", writer.FsyncModes)
+def test_commit_syncs_directories_after_renames(tmp_path, monkeypatch,
+                                                fsync):
+    synced = []
+
+    def fsync_dir(path):
+        assert (tmp_path / "docs" / "conf.py").exists()
+        synced.append(path)
+
+    monkeypatch.setattr(writer, "_fsync_dir", fsync_dir)
+    with writer.Transaction(base_path=str(tmp_path), fsync=fsync) as txn:
+        txn.write("docs/conf.py", "x")
+    if fsync == "none":
+        assert synced == []
+    else:
+        root = os.path.realpath(tmp_path)
+        assert os.path.join(root, "docs") in synced
+        assert root in synced
+
+
+def test_end_fsyncs_staged_files_not_the_host(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "sync", lambda: synced.append("host"))
+    monkeypatch.setattr(writer, "_fsync_file", synced.append)
+    with writer.Transaction(base_path=str(tmp_path), fsync="end") as txn:
+        txn.write("a", "x")
+        txn.write("b", "y")
+        staged = sorted(txn._staged.values())
+    assert sorted(synced) == staged